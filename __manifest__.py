@@ -21,7 +21,10 @@
         'security/security.xml',
         'security/ir.model.access.csv',
         'security/construction_security.xml',
+        'data/ir_cron_data.xml',
+        'wizard/boq_material_issue_views.xml',
         'views/project_task_views.xml',
+        'views/project_project_views.xml',
         'views/boq_views.xml',
         'views/purchase_views.xml',
         'views/stock_views.xml',
@@ -29,6 +32,9 @@
         'views/boq_report_views.xml',
         'views/boq_line_views.xml',
         'views/sale_order_views.xml',
+        'views/boq_ledger_queue_views.xml',
+        'views/boq_metric_views.xml',
+        'views/res_company_views.xml',
     ],
     'installable': True,
     'application': True,
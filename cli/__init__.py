@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from . import benchmark
+from . import stress
+from . import backfill
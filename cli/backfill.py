@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+from psycopg2 import errors
+
+from odoo import api, sql_db, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+PROGRESS_TABLE = 'sitemate_backfill_progress'
+MAX_ATTEMPTS = 3
+
+# Registry of the current worker process (set by _init_worker)
+_worker_registry = None
+
+
+def _init_worker(dbname):
+    global _worker_registry
+    # Never reuse a connection inherited from the parent process
+    sql_db.close_all()
+    _worker_registry = Registry(dbname)
+
+
+def _process_range(run_name, range_start, range_end, fnames):
+    """Recompute the lines of one id range in its own transaction. Returns (range_start, line_count, seconds)."""
+    start = time.perf_counter()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            with _worker_registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                Line = env['construction.boq.line']
+                cr.execute("""
+                    SELECT id FROM construction_boq_line
+                     WHERE id >= %s AND id < %s
+                  ORDER BY id
+                """, (range_start, range_end))
+                line_ids = [row[0] for row in cr.fetchall()]
+                if line_ids:
+                    if fnames:
+                        lines = Line.browse(line_ids)
+                        for fname in fnames:
+                            env.add_to_compute(Line._fields[fname], lines)
+                        lines.flush_recordset(fnames)
+                    else:
+                        Line._rebuild_line_rollups(line_ids)
+                    env.flush_all()
+                cr.execute("""
+                    UPDATE {} SET done_at = (now() at time zone 'UTC'), line_count = %s
+                     WHERE run_name = %s AND range_start = %s
+                """.format(PROGRESS_TABLE), (len(line_ids), run_name, range_start))
+            return range_start, len(line_ids), time.perf_counter() - start
+        except (errors.SerializationFailure, errors.DeadlockDetected):
+            # Ranges touching the same BOQ / task / project rows: retry
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(0.1 * attempt)
+
+
+class SiteMateBackfill(Command):
+    """Recompute stored BOQ line fields in parallel, resumable id ranges.
+
+    Lines are split into id ranges that a pool of worker processes
+    recomputes, each range in its own transaction. Finished ranges are
+    recorded in a progress table, so an interrupted run resumes where it
+    stopped when started again with the same --run name.
+
+    By default the ordered / remaining / consumed rollups are rebuilt in SQL;
+    --fields recomputes the given stored fields through the ORM instead.
+
+    Example:
+        odoo-bin sitemate_backfill -c odoo.conf -d prod --workers 8 --chunk-size 20000
+    """
+    name = 'sitemate_backfill'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{Path(sys.argv[0]).name} {self.name}',
+            description=self.__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        parser.add_argument('-c', '--config', dest='config', help="Odoo configuration file")
+        parser.add_argument('-d', '--database', dest='database', required=True)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help="Worker processes (default: %(default)s)")
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=10000,
+                            help="Width of each id range (default: %(default)s)")
+        parser.add_argument('--run', dest='run_name', default='default',
+                            help="Name of the run, used to resume it (default: %(default)s)")
+        parser.add_argument('--restart', action='store_true', help="Forget the progress of this run and start over")
+        parser.add_argument('--fields', default='',
+                            help="Comma-separated stored fields of construction.boq.line to recompute through the ORM")
+        args = parser.parse_args(cmdargs)
+
+        config_args = ['-d', args.database]
+        if args.config:
+            config_args += ['-c', args.config]
+        config.parse_config(config_args)
+
+        registry = Registry(args.database)
+        fnames = [fname.strip() for fname in args.fields.split(',') if fname.strip()]
+        line_fields = registry['construction.boq.line']._fields
+        invalid = [fname for fname in fnames if fname not in line_fields or not line_fields[fname].store or not line_fields[fname].compute]
+        if invalid:
+            parser.error("not stored computed fields of construction.boq.line: %s" % ', '.join(invalid))
+
+        pending = self._prepare_ranges(registry, args)
+        if not pending:
+            print("Nothing to do: every range of run '%s' is done." % args.run_name, file=sys.stderr)
+            return
+
+        # Children open their own connections
+        sql_db.close_all()
+        total = len(pending)
+        done = lines_done = 0
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(processes=max(args.workers, 1), initializer=_init_worker, initargs=(args.database,)) as pool:
+            tasks = [(args.run_name, range_start, range_end, fnames) for range_start, range_end in pending]
+            for _range_start, line_count, _seconds in pool.imap_unordered(_star_process_range, tasks):
+                done += 1
+                lines_done += line_count
+                elapsed = time.perf_counter() - start
+                rate = lines_done / elapsed if elapsed else 0.0
+                eta = (total - done) * elapsed / done
+                print("[%d/%d ranges] %d lines, %.0f lines/s, ETA %.0fs" % (done, total, lines_done, rate, eta),
+                      file=sys.stderr, flush=True)
+
+        print("Run '%s' finished: %d lines in %.1fs." % (args.run_name, lines_done, time.perf_counter() - start),
+              file=sys.stderr)
+
+    def _prepare_ranges(self, registry, args):
+        """Create the progress rows of the run (once) and return its pending (start, end) ranges."""
+        with registry.cursor() as cr:
+            cr.execute("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    run_name varchar NOT NULL,
+                    range_start integer NOT NULL,
+                    range_end integer NOT NULL,
+                    line_count integer,
+                    done_at timestamp,
+                    PRIMARY KEY (run_name, range_start)
+                )
+            """.format(PROGRESS_TABLE))
+            if args.restart:
+                cr.execute("DELETE FROM {} WHERE run_name = %s".format(PROGRESS_TABLE), (args.run_name,))
+
+            cr.execute("SELECT COUNT(*) FROM {} WHERE run_name = %s".format(PROGRESS_TABLE), (args.run_name,))
+            if not cr.fetchone()[0]:
+                cr.execute("SELECT MIN(id), MAX(id) FROM construction_boq_line")
+                min_id, max_id = cr.fetchone()
+                if min_id is not None:
+                    cr.execute("""
+                        INSERT INTO {} (run_name, range_start, range_end)
+                        SELECT %s, range_start, range_start + %s
+                          FROM generate_series(%s, %s, %s) AS range_start
+                    """.format(PROGRESS_TABLE), (args.run_name, args.chunk_size, min_id, max_id, args.chunk_size))
+
+            cr.execute("""
+                SELECT range_start, range_end FROM {}
+                 WHERE run_name = %s AND done_at IS NULL
+              ORDER BY range_start
+            """.format(PROGRESS_TABLE), (args.run_name,))
+            return cr.fetchall()
+
+
+def _star_process_range(task):
+    return _process_range(*task)
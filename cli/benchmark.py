@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..tools.benchmark import BOQBenchmark, DEFAULT_PARAMS
+
+
+class SiteMateBenchmark(Command):
+    """Run the SiteMate BOQ benchmark suite and print the results as JSON.
+
+    The data set is generated and every scenario runs in a single transaction
+    that is rolled back at the end: the database is left untouched.
+
+    Example:
+        odoo-bin sitemate_benchmark -c odoo.conf -d bench --lines 2000 -o result.json
+    """
+    name = 'sitemate_benchmark'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{Path(sys.argv[0]).name} {self.name}',
+            description=self.__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        parser.add_argument('-c', '--config', dest='config', help="Odoo configuration file")
+        parser.add_argument('-d', '--database', dest='database', required=True, help="Database with sitemate installed")
+        parser.add_argument('-o', '--output', dest='output', help="Write the JSON report to this file instead of stdout")
+        for key, default in DEFAULT_PARAMS.items():
+            parser.add_argument('--' + key.replace('_', '-'), dest=key, type=int, default=default,
+                                help="default: %(default)s")
+        args = parser.parse_args(cmdargs)
+
+        config_args = ['-d', args.database]
+        if args.config:
+            config_args += ['-c', args.config]
+        config.parse_config(config_args)
+
+        params = {key: getattr(args, key) for key in DEFAULT_PARAMS}
+        registry = Registry(args.database)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            try:
+                report = BOQBenchmark(env, **params).run()
+            finally:
+                cr.rollback()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if args.output:
+            Path(args.output).write_text(output + '\n')
+        else:
+            print(output)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from psycopg2 import errors
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.exceptions import UserError, ValidationError
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..tools.data_generator import BOQDataGenerator
+
+_logger = logging.getLogger(__name__)
+
+OPERATIONS = ('ledger', 'bill', 'picking', 'purchase')
+
+
+class SiteMateStress(Command):
+    """Hammer one set of BOQ lines with concurrent consumption and report races.
+
+    Worker threads, each with its own database cursor, repeatedly write
+    ledger entries, post vendor bills, validate deliveries and confirm
+    purchase orders against the same few BOQ lines. The report gives the
+    throughput, latencies, lock waits, deadlocks, serialization failures and
+    whether any BOQ budget was overrun.
+
+    The generated data is committed: run it on a disposable database.
+
+    Example:
+        odoo-bin sitemate_stress -c odoo.conf -d stress_db --threads 8 --iterations 50
+    """
+    name = 'sitemate_stress'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{Path(sys.argv[0]).name} {self.name}',
+            description=self.__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        parser.add_argument('-c', '--config', dest='config', help="Odoo configuration file")
+        parser.add_argument('-d', '--database', dest='database', required=True, help="Disposable database with sitemate installed")
+        parser.add_argument('-o', '--output', dest='output', help="Write the JSON report to this file instead of stdout")
+        parser.add_argument('--operations', default=','.join(OPERATIONS),
+                            help="Comma-separated operations among %s (default: all)" % ', '.join(OPERATIONS))
+        parser.add_argument('--threads', type=int, default=4, help="Threads per operation (default: %(default)s)")
+        parser.add_argument('--iterations', type=int, default=25, help="Operations per thread (default: %(default)s)")
+        parser.add_argument('--lines', type=int, default=5, help="Number of contended BOQ lines (default: %(default)s)")
+        parser.add_argument('--budget-qty', dest='budget_qty', type=float, default=50.0,
+                            help="Budget quantity of each line; low values force budget rejections (default: %(default)s)")
+        parser.add_argument('--seed', type=int, default=0)
+        args = parser.parse_args(cmdargs)
+
+        operations = [op.strip() for op in args.operations.split(',') if op.strip()]
+        unknown = set(operations) - set(OPERATIONS)
+        if unknown:
+            parser.error("unknown operation(s): %s" % ', '.join(sorted(unknown)))
+
+        config_args = ['-d', args.database]
+        if args.config:
+            config_args += ['-c', args.config]
+        config.parse_config(config_args)
+
+        registry = Registry(args.database)
+        boq_id, line_ids = self._setup(registry, args)
+
+        with registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['construction.boq.lock']._reset_lock_stats()
+
+        results = {operation: {'outcomes': Counter(), 'latencies': []} for operation in operations}
+        results_guard = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(registry, operation, boq_id, line_ids, args, index, results[operation], results_guard),
+                name='sitemate-stress-%s-%d' % (operation, index),
+            )
+            for operation in operations
+            for index in range(args.threads)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            lock_stats = env['construction.boq.lock']._get_lock_stats()
+            budget_check = self._check_budgets(env, line_ids)
+
+        report = {
+            'params': {
+                'operations': operations,
+                'threads': args.threads,
+                'iterations': args.iterations,
+                'lines': args.lines,
+                'budget_qty': args.budget_qty,
+                'seed': args.seed,
+            },
+            'boq_id': boq_id,
+            'seconds': round(elapsed, 3),
+            'operations': {
+                operation: self._summarize(data, elapsed) for operation, data in results.items()
+            },
+            'lock_waits': lock_stats,
+            'budget_overrun': bool(budget_check['overruns']),
+            **budget_check,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if args.output:
+            Path(args.output).write_text(output + '\n')
+        else:
+            print(output)
+
+    # -------------------------------------------------------------------------
+    # SETUP / WORKERS
+    # -------------------------------------------------------------------------
+    def _setup(self, registry, args):
+        """Create and commit one approved BOQ with ``args.lines`` contended lines."""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            generator = BOQDataGenerator(env, seed=args.seed)
+            generator.LINE_QUANTITY = args.budget_qty
+            products = generator.create_products(args.lines)
+            projects = generator.create_projects(1)
+            boq = generator.create_boqs(projects, products, lines=args.lines, section_every=0)
+            return boq.id, generator.product_lines(boq).ids
+
+    def _worker(self, registry, operation, boq_id, line_ids, args, index, result, guard):
+        rnd = random.Random('%s-%s-%s' % (args.seed, operation, index))
+        for iteration in range(args.iterations):
+            start = time.perf_counter()
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    generator = BOQDataGenerator(env, seed=rnd.random())
+                    self._run_operation(env, generator, operation, boq_id, line_ids, rnd)
+                outcome = 'ok'
+            except errors.DeadlockDetected:
+                outcome = 'deadlocks'
+            except errors.SerializationFailure:
+                outcome = 'serialization_failures'
+            except errors.LockNotAvailable:
+                outcome = 'lock_timeouts'
+            except ValidationError:
+                outcome = 'budget_rejections'
+            except UserError:
+                # The locking service gives up with a UserError after its retries
+                outcome = 'lock_timeouts'
+            except Exception:
+                _logger.warning("Stress %s operation failed", operation, exc_info=True)
+                outcome = 'errors'
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            with guard:
+                result['outcomes'][outcome] += 1
+                result['latencies'].append(latency_ms)
+
+    def _run_operation(self, env, generator, operation, boq_id, line_ids, rnd):
+        boq = env['construction.boq'].browse(boq_id)
+        if operation == 'ledger':
+            line = env['construction.boq.line'].browse(rnd.choice(line_ids))
+            env['construction.boq.consumption'].create(generator.prepare_ledger_vals(line, 1, quantity=1.0))
+        elif operation == 'bill':
+            generator.create_bills(boq, bills=1, bill_lines=len(line_ids)).action_post()
+        elif operation == 'picking':
+            generator.create_pickings(boq, pickings=1, picking_lines=len(line_ids)).move_ids._action_done()
+        elif operation == 'purchase':
+            generator.create_purchase_orders(boq, orders=1, order_lines=len(line_ids), quantity=1.0)
+
+    # -------------------------------------------------------------------------
+    # REPORT
+    # -------------------------------------------------------------------------
+    def _summarize(self, data, elapsed):
+        outcomes = data['outcomes']
+        latencies = sorted(data['latencies'])
+        summary = {
+            'attempts': sum(outcomes.values()),
+            'ok': outcomes['ok'],
+            'budget_rejections': outcomes['budget_rejections'],
+            'lock_timeouts': outcomes['lock_timeouts'],
+            'deadlocks': outcomes['deadlocks'],
+            'serialization_failures': outcomes['serialization_failures'],
+            'errors': outcomes['errors'],
+            'throughput_per_s': round(outcomes['ok'] / elapsed, 3) if elapsed else 0.0,
+        }
+        if latencies:
+            summary.update(
+                latency_p50_ms=round(statistics.median(latencies), 2),
+                latency_p95_ms=round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+                latency_max_ms=round(latencies[-1], 2),
+            )
+        return summary
+
+    def _check_budgets(self, env, line_ids):
+        """
+        Invariants that must hold whatever the interleaving:
+        - ordered quantity never exceeds budget + additional quantity;
+        - consumed amount (from the ledger itself) never exceeds the budget amount;
+        - the stored consumption rollups match the ledger.
+        """
+        lines = env['construction.boq.line'].browse(line_ids)
+        ordered = lines._get_ordered_quantities()
+        env.cr.execute("""
+            SELECT l.id, l.quantity + l.additional_quantity, l.quantity * l.estimated_rate,
+                   l.allow_over_consumption, l.consumed_amount,
+                   COALESCE(SUM(c.amount), 0.0)
+              FROM construction_boq_line l
+         LEFT JOIN construction_boq_consumption c ON c.boq_line_id = l.id
+             WHERE l.id = ANY(%s)
+          GROUP BY l.id
+        """, (list(line_ids),))
+
+        overruns = []
+        stale_rollups = []
+        for line_id, limit_qty, budget_amount, allow_over, stored_amount, ledger_amount in env.cr.fetchall():
+            ordered_qty = ordered.get(line_id, 0.0)
+            if not allow_over and (ordered_qty > limit_qty + 0.0001 or ledger_amount > budget_amount + 0.01):
+                overruns.append({
+                    'boq_line_id': line_id,
+                    'ordered_quantity': ordered_qty,
+                    'limit_quantity': limit_qty,
+                    'consumed_amount': ledger_amount,
+                    'budget_amount': budget_amount,
+                })
+            if abs((stored_amount or 0.0) - ledger_amount) > 0.01:
+                stale_rollups.append({
+                    'boq_line_id': line_id,
+                    'stored_consumed_amount': stored_amount,
+                    'ledger_consumed_amount': ledger_amount,
+                })
+        return {'overruns': overruns, 'stale_rollups': stale_rollups}
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 from . import boq_section
+from . import boq_lock
+from . import boq_metric
 from . import boq
 from . import boq_revision
+from . import boq_commitment
+from . import boq_ledger_queue
 from . import purchase
 from . import stock
 from . import account_move
 from . import boq_report
 from . import project_task
-from . import sale_order
\ No newline at end of file
+from . import project_project
+from . import sale_order
+from . import res_company
@@ -1,98 +1,136 @@
 # -*- coding: utf-8 -*-
+import re
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from collections import defaultdict
 
+from .boq_metric import profiled
+
+# Splits a bill line label into candidate activity-code tokens
+ACTIVITY_CODE_SPLIT = re.compile(r'[\s,;:()\[\]/]+')
+
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
+    @profiled('account.move.action_post')
     def action_post(self):
         """
         Override action_post to Create BOQ Consumption Ledger entries.
         Includes Concurrency Locking (Step 3.2).
+        The whole batch is processed at once: currency rates are fetched once
+        per (currency, company, date), quantities and amounts are validated
+        once per BOQ line, and the ledger rows are inserted in one create.
+        Depending on the company's BOQ Ledger Posting mode the ledger rows are
+        written now, or queued for the background worker.
         """
         # 1. Identify moves that need BOQ processing (Vendor Bills/Refunds)
         moves_to_process = self.filtered(lambda m: m.is_invoice(include_receipts=True))
-        
+        lines_with_boq = moves_to_process.invoice_line_ids.filtered('boq_line_id')
+
         # Early exit if no moves to process
-        if not moves_to_process:
+        if not lines_with_boq:
             return super(AccountMove, self).action_post()
-        
-        Consumption = self.env['construction.boq.consumption']
-        
-        # Collect all BOQ lines that need to be locked
-        boq_lines_to_lock = set()
-        lines_with_boq = []
-        
-        for move in moves_to_process:
-            for line in move.invoice_line_ids:
-                if line.boq_line_id:
-                    boq_lines_to_lock.add(line.boq_line_id.id)
-                    lines_with_boq.append((move, line))
-        
-        # Step 3.2: Implement Concurrency Locking - Lock all BOQ lines at once
-        if boq_lines_to_lock:
-            self.env.cr.execute(
-                """
-                SELECT id FROM construction_boq_line
-                WHERE id IN %s FOR UPDATE
-                """,
-                (tuple(boq_lines_to_lock),)
-            )
-            
-            # Bulk invalidate cache for all BOQ lines
-            boq_line_ids = list(boq_lines_to_lock)
-            boq_lines = self.env['construction.boq.line'].browse(boq_line_ids)
-            boq_lines.invalidate_recordset(['id'])
-        
-        # Group lines by company and currency for batch processing
-        consumption_vals_list = []
-        
-        for move, line in lines_with_boq:
+
+        # Memoized rates: one lookup per (from, to, company, date) for the batch
+        rate_cache = {}
+        Currency = self.env['res.currency']
+
+        def convert(amount, from_currency, to_currency, company, date):
+            if from_currency == to_currency:
+                return amount
+            key = (from_currency.id, to_currency.id, company.id, date)
+            if key not in rate_cache:
+                rate_cache[key] = Currency._get_conversion_rate(from_currency, to_currency, company, date)
+            return to_currency.round(amount * rate_cache[key])
+
+        today = fields.Date.today()
+        user_id = self.env.user.id
+        vals_by_mode = defaultdict(list)
+        move_by_source = {}
+
+        for line in lines_with_boq:
+            move = line.move_id
             # Determine direction: Refund reduces consumption, Invoice increases it
             sign = -1 if move.move_type in ('in_refund', 'out_refund') else 1
-            
-            # Convert quantity based on move type
-            qty_to_consume = line.quantity * sign
-            
+            date = move.date or today
+
             # Handle Currency Conversion for Amount
             # BOQ is in Company Currency, Bill might be in Foreign Currency
-            amount_currency = line.currency_id
-            amount_boq_currency = line.boq_line_id.currency_id
-            
-            if amount_currency != amount_boq_currency:
-                # Convert line amount to BOQ currency
-                amount_to_consume = amount_currency._convert(
-                    line.price_subtotal,
-                    amount_boq_currency,
-                    move.company_id,
-                    move.date or fields.Date.today()
-                ) * sign
-            else:
-                amount_to_consume = line.price_subtotal * sign
-            
-            # Validate Limits
-            if sign > 0:
-                line.boq_line_id.check_consumption(qty_to_consume, amount_to_consume)
-            
-            # Prepare consumption entry
-            consumption_vals_list.append({
+            amount_to_consume = convert(
+                line.price_subtotal,
+                line.currency_id,
+                line.boq_line_id.currency_id,
+                move.company_id,
+                date
+            ) * sign
+
+            vals_by_mode[move.company_id.boq_ledger_posting_mode].append({
                 'boq_line_id': line.boq_line_id.id,
                 'source_model': 'account.move.line',
                 'source_id': line.id,
-                'quantity': qty_to_consume,
+                'quantity': line.quantity * sign,
                 'amount': amount_to_consume,
-                'date': move.date or fields.Date.today(),
-                'user_id': self.env.user.id
+                'date': date,
+                'user_id': user_id
             })
-        
-        # Create all consumption records in batch
-        if consumption_vals_list:
-            Consumption.create(consumption_vals_list)
-        
+            move_by_source[line.id] = move.id
+
+        Queue = self.env['construction.boq.ledger.queue']
+
+        # Synchronous: lock, then create all consumption records in batch.
+        # The ledger validates the aggregated totals once per BOQ line.
+        if vals_by_mode['sync']:
+            self._lock_boq_lines_for_posting(vals_by_mode['sync'])
+            self.env['construction.boq.consumption'].create(vals_by_mode['sync'])
+
+        # Deferred (strict): validate now against ledger + queued totals, write later
+        if vals_by_mode['deferred_strict']:
+            strict_vals = vals_by_mode['deferred_strict']
+            boq_lines = self._lock_boq_lines_for_posting(strict_vals)
+            totals = defaultdict(lambda: [0.0, 0.0])
+            for line_id, (qty, amount) in Queue._get_pending_totals(boq_lines.ids).items():
+                totals[line_id][0] += qty
+                totals[line_id][1] += amount
+            for vals in strict_vals:
+                totals[vals['boq_line_id']][0] += vals['quantity']
+                totals[vals['boq_line_id']][1] += vals['amount']
+            boq_lines._check_consumption_totals(totals)
+            Queue._enqueue(strict_vals, move_by_source, strict=True)
+
+        # Deferred: no lock and no check on the critical path
+        if vals_by_mode['deferred']:
+            Queue._enqueue(vals_by_mode['deferred'], move_by_source)
+
         # 2. Call super to perform standard posting
         return super(AccountMove, self).action_post()
 
+    def _lock_boq_lines_for_posting(self, vals_list):
+        # Step 3.2: Implement Concurrency Locking - Lock all BOQ lines at once
+        boq_lines = self.env['construction.boq.line'].browse(list({vals['boq_line_id'] for vals in vals_list}))
+        self.env['construction.boq.lock']._lock_lines(boq_lines.ids, 'account.move.action_post')
+        # Re-read the consumption totals now that the rows are locked
+        boq_lines.invalidate_recordset(['consumed_quantity', 'consumed_amount', 'remaining_quantity', 'remaining_amount'])
+        boq_lines._refresh_deferred_rollups()
+        return boq_lines
+
+    def action_boq_match_lines(self):
+        """
+        Bulk action: assign BOQ Items to the lines of the selected draft bills
+        from their analytic account, product and activity code.
+        """
+        lines = self.filtered(lambda m: m.state == 'draft' and m.is_purchase_document(include_receipts=True)).invoice_line_ids
+        matched = lines._boq_auto_match()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('BOQ Matching'),
+                'message': _('%s bill line(s) linked to BOQ items.') % len(matched),
+                'type': 'success' if matched else 'warning',
+                'sticky': False,
+            }
+        }
+
 class AccountMoveLine(models.Model):
     _inherit = 'account.move.line'
 
@@ -100,11 +138,79 @@ class AccountMoveLine(models.Model):
         'construction.boq.line',
         string='BOQ Item',
         index=True,
-        # [FIX] Added display_type = False to domain
-        domain="[('boq_id.state', 'in', ('approved', 'locked')), ('display_type', '=', False)]",
+        # Stored eligibility flag: Approved/Locked active BOQ and not a Section/Note
+        domain="[('is_boq_eligible', '=', True)]",
         help="Link this invoice line to a BOQ line for cost tracking."
     )
 
+    # -------------------------------------------------------------------------
+    # BOQ MATCHING (bills entered without a Purchase Order)
+    # -------------------------------------------------------------------------
+    def _get_boq_analytic_account_ids(self):
+        """Analytic account ids of the line's distribution (keys may hold 'id1,id2')."""
+        self.ensure_one()
+        account_ids = set()
+        for key in (self.analytic_distribution or {}):
+            account_ids.update(int(account_id) for account_id in str(key).split(',') if account_id.isdigit())
+        return account_ids
+
+    def _boq_find_matches(self):
+        """
+        Propose a BOQ line for each unlinked product line, using one lookup
+        index for the whole batch. A product match on the line's analytic
+        account wins; otherwise an activity code found in the label is used.
+        Only unambiguous matches are returned.
+        Returns a dict {account.move.line: boq_line_id}.
+        """
+        candidates = self.filtered(lambda l: not l.boq_line_id and l.display_type == 'product')
+        if not candidates:
+            return {}
+
+        analytic_by_line = {line: line._get_boq_analytic_account_ids() for line in candidates}
+        all_analytic_ids = set().union(*analytic_by_line.values())
+        by_product, by_code = self.env['construction.boq.line']._get_analytic_matching_index(all_analytic_ids)
+        if not by_product and not by_code:
+            return {}
+
+        matches = {}
+        for line, analytic_ids in analytic_by_line.items():
+            found = set()
+            if line.product_id:
+                for analytic_id in analytic_ids:
+                    found |= by_product.get((analytic_id, line.product_id.id), set())
+            if not found and by_code and line.name:
+                tokens = {token.upper() for token in ACTIVITY_CODE_SPLIT.split(line.name) if token}
+                for analytic_id in analytic_ids:
+                    for token in tokens:
+                        found |= by_code.get((analytic_id, token), set())
+            if len(found) == 1:
+                matches[line] = found.pop()
+        return matches
+
+    def _boq_auto_match(self):
+        """
+        Assign the unambiguous matches, one write per BOQ line.
+        Returns the lines that were linked.
+        """
+        lines_by_boq_line = defaultdict(lambda: self.browse())
+        for line, boq_line_id in self._boq_find_matches().items():
+            lines_by_boq_line[boq_line_id] |= line
+
+        linked = self.browse()
+        for boq_line_id, lines in lines_by_boq_line.items():
+            lines.write({'boq_line_id': boq_line_id})
+            linked |= lines
+        return linked
+
+    @api.onchange('product_id', 'analytic_distribution', 'name')
+    def _onchange_boq_auto_match(self):
+        """Propose a BOQ Item while the bill line is being entered."""
+        if self.boq_line_id or self.purchase_line_id or not self.move_id.is_purchase_document(include_receipts=True):
+            return
+        boq_line_id = self._boq_find_matches().get(self)
+        if boq_line_id:
+            self.boq_line_id = boq_line_id
+
     # REMOVED: @api.model_create_multi def create(self, vals_list)
     # The logic is moved to PurchaseOrderLine._prepare_account_move_line in models/purchase.py
 
@@ -1,7 +1,20 @@
 # -*- coding: utf-8 -*-
 import re
-from odoo import models, fields, api, _, Command
+from collections import defaultdict
+from datetime import timedelta
+from odoo import models, modules, fields, api, tools, _, Command
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import frozendict, SQL
+
+from .boq_metric import profiled
+
+# Stored line rollups that can be deferred and rebuilt in SQL (see _rebuild_line_rollups)
+DEFERRED_LINE_FIELDS = [
+    'ordered_quantity', 'remaining_quantity', 'is_complete', 'committed_amount',
+    'consumed_quantity', 'consumed_amount', 'remaining_amount',
+]
+DIRTY_LINES_KEY = 'sitemate.boq_dirty_line_ids'
+REBUILD_CURSOR_PARAM = 'sitemate.boq_rebuild_last_id'
 
 class ConstructionBOQ(models.Model):
     _name = 'construction.boq'
@@ -44,47 +57,89 @@ class ConstructionBOQ(models.Model):
     total_budget = fields.Monetary(string='Total Budget', compute='_compute_total_budget', currency_field='currency_id', store=True, tracking=True)
     
     revision_ids = fields.One2many('construction.boq.revision', 'original_boq_id', string='Revisions (Technical)', copy=False)
+    commitment_ids = fields.One2many('construction.boq.commitment', 'boq_id', string='Commitment Checkpoints', copy=False)
     
     display_revision_ids = fields.Many2many('construction.boq.revision', compute='_compute_display_revision_ids', string='Revision History')
 
+    # Bumped (from a non-transactional sequence) whenever the product -> line
+    # mapping or completion of lines changes; keys the cached line index.
+    line_index_version = fields.Integer(string='Line Index Version', readonly=True, copy=False, default=0)
+
     # -------------------------------------------------------------------------
     # [NEW] SALE ORDER IMPORT LOGIC
     # -------------------------------------------------------------------------
-    def _get_lines_from_sale_order(self, order):
+    @api.model
+    def _prepare_line_vals_from_sale_order(self, order):
         """
-        Helper method to map Sale Order Lines to BOQ Lines (Command.create).
+        Map Sale Order Lines to BOQ line values (without boq_id).
+        Product costs and expense accounts are prefetched in bulk for the
+        order's company instead of being resolved product by product.
         """
-        new_lines = []
-        for line in order.order_line:
+        order_lines = order.order_line
+        order_lines.fetch(['display_type', 'name', 'sequence', 'product_id', 'product_uom_qty', 'product_uom'])
+        products = order_lines.product_id.with_company(order.company_id)
+        products.fetch(['name', 'standard_price', 'property_account_expense_id', 'categ_id'])
+        products.categ_id.fetch(['property_account_expense_categ_id'])
+
+        vals_list = []
+        for line in order_lines:
             # Handle Section/Notes
             if line.display_type:
-                data = {
+                vals_list.append({
                     'display_type': 'line_section' if line.display_type == 'line_section' else 'line_note',
                     'name': line.name,
                     'sequence': line.sequence,
-                }
-                new_lines.append(Command.create(data))
+                })
                 continue
 
             # Handle Product Lines
-            product = line.product_id
-            
+            product = line.product_id.with_company(order.company_id)
+
             # Determine Expense Account (Fallback logic)
             expense_account = product.property_account_expense_id or \
                               product.categ_id.property_account_expense_categ_id
-            
-            data = {
+
+            vals_list.append({
                 'product_id': product.id,
                 'name': line.name or product.name,
                 'quantity': line.product_uom_qty,
                 'uom_id': line.product_uom.id,
                 # IMPORTANT: BOQ uses Cost (Standard Price), NOT Sales Price
-                'estimated_rate': product.standard_price, 
+                'estimated_rate': product.standard_price,
                 'expense_account_id': expense_account.id if expense_account else False,
                 'sequence': line.sequence,
-            }
-            new_lines.append(Command.create(data))
-        return new_lines
+            })
+        return vals_list
+
+    def _get_lines_from_sale_order(self, order):
+        """
+        Helper method to map Sale Order Lines to BOQ Lines (Command.create).
+        """
+        return [Command.create(vals) for vals in self._prepare_line_vals_from_sale_order(order)]
+
+    @api.model
+    def _generate_from_sale_order(self, order):
+        """
+        Build a draft BOQ for a sale order directly on the server: one header
+        create and one batched create for all of its lines.
+        """
+        if not order.project_id:
+            raise UserError(_('Sale Order %s has no project to attach the BOQ to.') % order.name)
+        if not order.project_id.account_id:
+            raise UserError(_('The project of Sale Order %s has no analytic account.') % order.name)
+
+        boq = self.create({
+            'name': f"{order.name} - BOQ",
+            'sale_order_id': order.id,
+            'project_id': order.project_id.id,
+            'analytic_account_id': order.project_id.account_id.id,
+            'company_id': order.company_id.id,
+        })
+        line_vals_list = self._prepare_line_vals_from_sale_order(order)
+        for vals in line_vals_list:
+            vals['boq_id'] = boq.id
+        self.env['construction.boq.line'].create(line_vals_list)
+        return boq
 
     @api.model
     def default_get(self, fields_list):
@@ -185,9 +240,204 @@ class ConstructionBOQ(models.Model):
         self.create_revision_snapshot()
         return True
 
+    def action_link_tasks(self):
+        """Link the lines of these BOQs to project tasks by activity code."""
+        report = self.env['construction.boq.line']._link_tasks_by_activity_code(self.project_id.ids)
+        message = _('%(linked)s line(s) linked to tasks, %(coded)s activity code(s) filled.') % {
+            'linked': report['linked_lines'],
+            'coded': report['coded_lines'] + report['coded_tasks'],
+        }
+        if report['locked_lines']:
+            message += '\n' + _('%s line(s) of submitted or approved BOQs were left unlinked: revise the BOQ to link them.') % report['locked_lines']
+        unmatched = sorted(code for codes in report['unmatched'].values() for code in codes)
+        if unmatched:
+            message += '\n' + _('Codes without a matching task: %s') % ', '.join(unmatched)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Task Linking'),
+                'message': message,
+                'type': 'warning' if unmatched or report['locked_lines'] else 'success',
+                'sticky': bool(unmatched or report['locked_lines']),
+            }
+        }
+
+    # -------------------------------------------------------------------------
+    # CACHED PRODUCT -> LINE INDEX
+    # -------------------------------------------------------------------------
+    def init(self):
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS construction_boq_line_index_version_seq")
+
+    def _bump_line_index_version(self):
+        """
+        Invalidate the cached line index of these BOQs.
+        Versions come from a sequence, so a rolled back transaction can never
+        hand out a version number that a later transaction reuses.
+        """
+        boq_ids = [boq_id for boq_id in self.ids if isinstance(boq_id, int)]
+        if not boq_ids:
+            return
+        self.env.cr.execute("""
+            UPDATE construction_boq
+               SET line_index_version = nextval('construction_boq_line_index_version_seq')
+             WHERE id IN %s
+        """, (tuple(boq_ids),))
+        self.browse(boq_ids).invalidate_recordset(['line_index_version'])
+
+    def _get_line_index(self):
+        """
+        Return the (product -> lines) index of this BOQ as a tuple
+        (lines_by_product, open_product_ids) where lines_by_product maps
+        product_id -> ((line_id, is_complete), ...) in sequence order and
+        open_product_ids is the frozenset of products with at least one
+        line left to order.
+        The index is cached across requests, keyed on line_index_version.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT line_index_version FROM construction_boq WHERE id = %s", (self.id,))
+        row = self.env.cr.fetchone()
+        version = row[0] if row else 0
+        return self._get_line_index_cached(self.id, version)
+
+    @tools.ormcache('boq_id', 'version')
+    def _get_line_index_cached(self, boq_id, version):
+        self.env['construction.boq.line'].flush_model(['boq_id', 'product_id', 'display_type', 'is_complete', 'sequence'])
+        self.env.cr.execute("""
+            SELECT product_id, id, is_complete
+              FROM construction_boq_line
+             WHERE boq_id = %s
+               AND display_type IS NULL
+               AND product_id IS NOT NULL
+          ORDER BY sequence, id
+        """, (boq_id,))
+
+        lines_by_product = defaultdict(list)
+        for product_id, line_id, is_complete in self.env.cr.fetchall():
+            lines_by_product[product_id].append((line_id, bool(is_complete)))
+
+        open_product_ids = frozenset(
+            product_id for product_id, entries in lines_by_product.items()
+            if any(not is_complete for _line_id, is_complete in entries)
+        )
+        return frozendict({k: tuple(v) for k, v in lines_by_product.items()}), open_product_ids
+
+    # -------------------------------------------------------------------------
+    # PROCUREMENT PLANNER
+    # -------------------------------------------------------------------------
+    def _get_vendor_map(self, products):
+        """
+        Resolve the preferred vendor (product.supplierinfo) of each product
+        in a single pass over the vendor pricelists.
+        Variant-specific entries win over template entries; within each,
+        the first entry by sequence wins.
+        Returns a dict {product_id: supplierinfo}.
+        """
+        today = fields.Date.context_today(self)
+        company_ids = self.mapped('company_id').ids
+        sellers = self.env['product.supplierinfo'].search([
+            ('product_tmpl_id', 'in', products.product_tmpl_id.ids),
+            ('company_id', 'in', company_ids + [False]),
+            '|', ('date_start', '=', False), ('date_start', '<=', today),
+            '|', ('date_end', '=', False), ('date_end', '>=', today),
+        ], order='sequence, min_qty desc, price, id')
+
+        variant_map = {}
+        template_map = {}
+        for seller in sellers:
+            if seller.product_id:
+                variant_map.setdefault(seller.product_id.id, seller)
+            else:
+                template_map.setdefault(seller.product_tmpl_id.id, seller)
+
+        return {
+            product.id: variant_map.get(product.id) or template_map.get(product.product_tmpl_id.id)
+            for product in products
+            if variant_map.get(product.id) or template_map.get(product.product_tmpl_id.id)
+        }
+
+    def action_generate_rfqs(self):
+        """
+        Procurement Planner: create draft BOQ-mode RFQs for every line with a
+        positive remaining quantity, grouped by BOQ, preferred vendor,
+        lead time, cost type and currency. All RFQs are created in one batch.
+        """
+        if any(boq.state not in ('approved', 'locked') for boq in self):
+            raise UserError(_('RFQs can only be generated from Approved or Locked BOQs.'))
+
+        lines = self.boq_line_ids.filtered(
+            lambda l: not l.display_type and l.remaining_quantity > 0.0001
+        )
+        if not lines:
+            raise UserError(_('There is nothing left to procure on the selected BOQs.'))
+
+        vendor_map = self._get_vendor_map(lines.product_id)
+
+        groups = defaultdict(lambda: self.env['construction.boq.line'])
+        lines_without_vendor = self.env['construction.boq.line']
+        for line in lines:
+            seller = vendor_map.get(line.product_id.id)
+            if not seller:
+                lines_without_vendor |= line
+                continue
+            key = (line.boq_id, seller.partner_id, seller.delay, line.cost_type, seller.currency_id)
+            groups[key] |= line
+
+        if not groups:
+            raise UserError(
+                _('No vendor is configured for the remaining BOQ products:\n%s') %
+                "\n".join(lines_without_vendor.mapped('product_id.display_name'))
+            )
+
+        now = fields.Datetime.now()
+        order_vals_list = []
+        for (boq, partner, delay, cost_type, currency), group_lines in groups.items():
+            date_planned = now + timedelta(days=delay)
+            order_lines = []
+            for line in group_lines:
+                seller = vendor_map[line.product_id.id]
+                price = seller.price
+                if seller.product_uom and line.uom_id and seller.product_uom != line.uom_id:
+                    price = seller.product_uom._compute_price(price, line.uom_id)
+                order_lines.append(Command.create({
+                    'product_id': line.product_id.id,
+                    'name': line.name,
+                    'product_qty': line.remaining_quantity,
+                    'product_uom': line.uom_id.id,
+                    'price_unit': price,
+                    'date_planned': date_planned,
+                    'boq_line_id': line.id,
+                    'analytic_distribution': line.analytic_distribution,
+                }))
+            order_vals_list.append({
+                'partner_id': partner.id,
+                'purchase_type': 'boq',
+                'project_id': boq.project_id.id,
+                'boq_id': boq.id,
+                'company_id': boq.company_id.id,
+                'currency_id': currency.id or boq.currency_id.id,
+                'origin': boq.name,
+                'date_planned': date_planned,
+                'order_line': order_lines,
+            })
+
+        orders = self.env['purchase.order'].create(order_vals_list)
+
+        for boq in lines_without_vendor.boq_id:
+            boq_lines = lines_without_vendor.filtered(lambda l: l.boq_id == boq)
+            boq.message_post(body=_('Procurement Planner: no vendor configured for %s line(s): %s') % (
+                len(boq_lines), ", ".join(boq_lines.mapped('name'))
+            ))
+
+        action = self.env['ir.actions.act_window']._for_xml_id('purchase.purchase_rfq')
+        action['domain'] = [('id', 'in', orders.ids)]
+        action['context'] = {}
+        return action
+
     # -------------------------------------------------------------------------
     # COPY-ON-WRITE (AUTO VERSIONING) LOGIC
     # -------------------------------------------------------------------------
+    @profiled('construction.boq.create_revision_snapshot')
     def create_revision_snapshot(self):
         boqs_to_revise = self.filtered(
             lambda b: b.state in ['submitted', 'approved', 'locked']
@@ -198,13 +448,19 @@ class ConstructionBOQ(models.Model):
             
         revision_vals_list = []
         boq_update_vals = {}
-        messages_to_post = []
+        messages_to_post = {}
         
         for boq in boqs_to_revise:
             base_name = re.sub(r' \(v\d+\)$', '', boq.name)
             history_name = f"{base_name} (v{boq.version})"
             
-            history_boq = boq.with_context(revision_copy=True, mail_create_nosubscribe=True).copy({
+            # Archived copies: no tracking, no creation log, no followers
+            history_boq = boq.with_context(
+                revision_copy=True,
+                tracking_disable=True,
+                mail_create_nolog=True,
+                mail_create_nosubscribe=True,
+            ).copy({
                 'name': history_name,
                 'active': False,
                 'state': 'locked',
@@ -230,7 +486,7 @@ class ConstructionBOQ(models.Model):
                 'approved_by': False,
             }
             
-            messages_to_post.append((boq, f"Content modified. Archived v{new_version-1} and upgraded to v{new_version}."))
+            messages_to_post[boq.id] = f"Content modified. Archived v{new_version-1} and upgraded to v{new_version}."
         
         if revision_vals_list:
             self.env['construction.boq.revision'].create(revision_vals_list)
@@ -238,8 +494,9 @@ class ConstructionBOQ(models.Model):
         for boq_id, vals in boq_update_vals.items():
             super(ConstructionBOQ, self.browse(boq_id)).write(vals)
         
-        for boq, body in messages_to_post:
-            boq.message_post(body=body)
+        # One batched insert for all the revision notes
+        if messages_to_post:
+            self.browse(list(messages_to_post))._message_log_batch(bodies=messages_to_post)
 
     def write(self, vals):
         if self.env.context.get('revision_copy'):
@@ -248,7 +505,7 @@ class ConstructionBOQ(models.Model):
         ignore_fields = [
             'message_follower_ids', 'state', 'approval_date', 'approved_by', 
             'active', 'total_budget', 'previous_boq_id', 'revision_ids', 
-            'display_revision_ids', 'write_date', 'write_uid', 'name',
+            'display_revision_ids', 'commitment_ids', 'write_date', 'write_uid', 'name',
             'sale_order_id' # Don't version just for linking fields
         ]
         
@@ -259,7 +516,34 @@ class ConstructionBOQ(models.Model):
             )
             if boqs_to_revise:
                 boqs_to_revise.create_revision_snapshot()
-        return super(ConstructionBOQ, self).write(vals)
+        res = super(ConstructionBOQ, self).write(vals)
+        self._log_audit_summary(vals)
+        return res
+
+    # -------------------------------------------------------------------------
+    # AUDIT TRAIL (full / summary per company)
+    # -------------------------------------------------------------------------
+    def _get_summary_audit_boqs(self):
+        return self.filtered(lambda b: b.company_id.boq_audit_mode == 'summary')
+
+    def _track_prepare(self, fields_iter):
+        # Summary audit: no per-field tracking values, see _log_audit_summary
+        return super(ConstructionBOQ, self - self._get_summary_audit_boqs())._track_prepare(fields_iter)
+
+    def _log_audit_summary(self, vals):
+        """Summary audit: one short note per BOQ, all inserted in one batch."""
+        if self.env.context.get('tracking_disable'):
+            return
+        boqs = self._get_summary_audit_boqs()
+        tracked = [fname for fname in self._track_get_fields() if fname in vals]
+        if not boqs or not tracked:
+            return
+        labels = ', '.join(self._fields[fname]._description_string(self.env) for fname in tracked)
+        if len(boqs) > 1:
+            body = _('Updated in a batch of %(count)s BOQs: %(fields)s') % {'count': len(boqs), 'fields': labels}
+        else:
+            body = _('Updated: %s') % labels
+        boqs._message_log_batch(bodies={boq.id: body for boq in boqs})
 
     # -------------------------------------------------------------------------
     # CONSTRAINTS
@@ -280,20 +564,14 @@ class ConstructionBOQ(models.Model):
         if not active_boqs:
             return
             
-        project_version_pairs = [
-            (boq.project_id.id, boq.version)
-            for boq in active_boqs
-        ]
-        
-        for project_id, version in project_version_pairs:
-            duplicate_count = self.search_count([
-                ('project_id', '=', project_id),
-                ('version', '=', version),
-                ('active', '=', True),
-                ('id', 'in', active_boqs.ids)
-            ])
-            if duplicate_count > 1:
-                raise ValidationError(_('An active BOQ with this version already exists for this project.'))
+        # One grouped query for the whole batch instead of a count per BOQ
+        duplicates = self._read_group(
+            [('id', 'in', active_boqs.ids), ('active', '=', True)],
+            ['project_id', 'version'],
+            having=[('__count', '>', 1)],
+        )
+        if duplicates:
+            raise ValidationError(_('An active BOQ with this version already exists for this project.'))
 
     def _check_one_active_boq(self):
         if not self:
@@ -328,7 +606,19 @@ class ConstructionBOQLine(models.Model):
     boq_id = fields.Many2one('construction.boq', string='BOQ Reference', required=True, ondelete='cascade', index=True)
     
     # [FIX] Added project_id related field to handle domains in sub-views where 'parent' is not available
-    project_id = fields.Many2one('project.project', related='boq_id.project_id', store=True, readonly=True)
+    project_id = fields.Many2one('project.project', related='boq_id.project_id', store=True, readonly=True, index=True)
+
+    # Denormalized header status: relational domains (stock moves, bill lines,
+    # PO lines) filter on these without joining construction_boq.
+    boq_state = fields.Selection(related='boq_id.state', string='BOQ Status', store=True, index=True)
+    boq_active = fields.Boolean(related='boq_id.active', string='BOQ Active', store=True)
+    is_boq_eligible = fields.Boolean(
+        string='Eligible for Consumption',
+        compute='_compute_is_boq_eligible',
+        store=True,
+        index=True,
+        help="Product line of an active, Approved or Locked BOQ."
+    )
     
     display_type = fields.Selection([
         ('line_section', 'Section'),
@@ -364,6 +654,9 @@ class ConstructionBOQLine(models.Model):
     uom_id = fields.Many2one('uom.uom', string='Unit of Measure')
     
     budget_amount = fields.Monetary(string='Budget Amount', compute='_compute_budget_amount', currency_field='currency_id', store=True)
+    committed_amount = fields.Monetary(
+        string='Committed Amount', compute='_compute_committed_amount', currency_field='currency_id', store=True,
+        help="Ordered quantity valued at the budget rate.")
     
     # Updated compute method for Task 1.1 logic
     remaining_amount = fields.Monetary(string='Available Budget', compute='_compute_consumption', currency_field='currency_id', store=True)
@@ -444,29 +737,52 @@ class ConstructionBOQLine(models.Model):
                 
             rec.product_config_valid = valid
 
+    @api.depends('display_type', 'boq_id.state', 'boq_id.active')
+    def _compute_is_boq_eligible(self):
+        for rec in self:
+            rec.is_boq_eligible = (
+                not rec.display_type and
+                rec.boq_id.active and
+                rec.boq_id.state in ('approved', 'locked')
+            )
+
     @api.depends('quantity', 'estimated_rate')
     def _compute_budget_amount(self):
         for rec in self:
             rec.budget_amount = rec.quantity * rec.estimated_rate
 
+    @api.depends('ordered_quantity', 'estimated_rate')
+    def _compute_committed_amount(self):
+        for rec in self._boq_defer_recompute(['committed_amount']):
+            rec.committed_amount = rec.ordered_quantity * rec.estimated_rate
+
     # Task 1.2: Implement Computation Logic for Ordered Quantity
-    @api.depends('purchase_line_ids.state', 'purchase_line_ids.product_qty', 'purchase_line_ids.product_uom')
+    @api.depends('uom_id', 'purchase_line_ids.state', 'purchase_line_ids.product_qty', 'purchase_line_ids.product_uom')
     def _compute_ordered_quantity(self):
-        for rec in self:
+        todo = self._boq_defer_recompute(['ordered_quantity'])
+        # Saved lines: one grouped query for the whole recordset, converted into the BOQ line UoM.
+        existing_records = todo.filtered(lambda r: r.id and not r.display_type)
+        ordered_map = existing_records._get_ordered_quantities()
+
+        for rec in todo:
             if rec.display_type:
                 rec.ordered_quantity = 0.0
-                continue
-            
-            # Filter non-cancelled PO lines
-            # Note: We rely on standard UoM matching. If UoM differs, conversion logic would be needed here.
-            # Assuming PO line UoM matches BOQ UoM for Phase 1.
-            valid_lines = rec.purchase_line_ids.filtered(lambda l: l.state != 'cancel')
-            rec.ordered_quantity = sum(valid_lines.mapped('product_qty'))
+            elif rec.id:
+                rec.ordered_quantity = ordered_map.get(rec.id, 0.0)
+            else:
+                # New (in-memory) lines: convert the cached PO lines in Python
+                total = 0.0
+                for po_line in rec.purchase_line_ids.filtered(lambda l: l.state != 'cancel'):
+                    if rec.uom_id and po_line.product_uom and po_line.product_uom != rec.uom_id:
+                        total += po_line.product_uom._compute_quantity(po_line.product_qty, rec.uom_id, round=False)
+                    else:
+                        total += po_line.product_qty
+                rec.ordered_quantity = total
 
     # Task 1.1: Update remaining_quantity logic: (quantity + additional_quantity) - ordered_quantity
     @api.depends('quantity', 'additional_quantity', 'ordered_quantity')
     def _compute_remaining_quantity(self):
-        for rec in self:
+        for rec in self._boq_defer_recompute(['remaining_quantity']):
             if rec.display_type:
                 rec.remaining_quantity = 0.0
             else:
@@ -475,20 +791,44 @@ class ConstructionBOQLine(models.Model):
     # Task 1.1: Add is_complete computation
     @api.depends('remaining_quantity')
     def _compute_is_complete(self):
-        for rec in self:
+        todo = self._boq_defer_recompute(['is_complete'])
+        # Completion drives the cached product -> line index of the header:
+        # compare with the previous value and only invalidate it on a flip.
+        # Records marked to recompute keep their old value in cache; it is
+        # only read from the database for lines that were never loaded.
+        # New lines already invalidate it in create().
+        field = self._fields['is_complete']
+        previous = {}
+        for rec in todo:
+            if isinstance(rec.id, int):
+                previous[rec.id] = self.env.cache.get(rec, field, None)
+        uncached_ids = tuple(line_id for line_id, value in previous.items() if value is None)
+        if uncached_ids:
+            self.env.cr.execute(
+                "SELECT id, is_complete FROM construction_boq_line WHERE id IN %s", (uncached_ids,)
+            )
+            previous.update(self.env.cr.fetchall())
+
+        flipped_ids = []
+        for rec in todo:
             if rec.display_type:
                 rec.is_complete = False
             else:
                 # Complete if no remaining quantity to order
                 rec.is_complete = rec.remaining_quantity <= 0
+            if rec.id in previous and bool(previous[rec.id]) != rec.is_complete:
+                flipped_ids.append(rec.id)
+        self.browse(flipped_ids).boq_id._bump_line_index_version()
 
     @api.depends('quantity', 'budget_amount', 'consumption_ids.quantity', 'consumption_ids.amount')
+    @profiled('construction.boq.line._compute_consumption')
     def _compute_consumption(self):
         # BOLT: ⚡ Refactored for performance.
         # Modified to decouple remaining_quantity logic (now handled by _compute_remaining_quantity)
+        todo = self._boq_defer_recompute(['consumed_quantity', 'consumed_amount', 'remaining_amount'])
 
         # Step 1: Initialize all records.
-        for rec in self:
+        for rec in todo:
             if rec.display_type:
                 rec.consumed_quantity = 0.0
                 rec.consumed_amount = 0.0
@@ -500,7 +840,7 @@ class ConstructionBOQLine(models.Model):
                 rec.remaining_amount = rec.budget_amount
 
         # Step 2: Efficiently process records that are saved in the database.
-        existing_records = self.filtered(lambda r: r.id and not r.display_type)
+        existing_records = todo.filtered(lambda r: r.id and not r.display_type)
         if existing_records:
             consumption_data = self.env['construction.boq.consumption'].read_group(
                 [('boq_line_id', 'in', existing_records.ids)],
@@ -525,7 +865,7 @@ class ConstructionBOQLine(models.Model):
                     rec.remaining_amount = rec.budget_amount - c_amt
 
         # Step 3: Process new (in-memory) records that haven't been saved yet.
-        new_records = self.filtered(lambda r: not r.id and not r.display_type)
+        new_records = todo.filtered(lambda r: not r.id and not r.display_type)
         for rec in new_records:
             if rec.consumption_ids:
                 c_qty = sum(rec.consumption_ids.mapped('quantity'))
@@ -623,6 +963,16 @@ class ConstructionBOQLine(models.Model):
             if amount > self.remaining_amount + 0.01:
                  raise ValidationError(_('BOQ Budget Exceeded for %s.') % self.name)
 
+    def _check_consumption_totals(self, totals):
+        """
+        Validate aggregated consumption once per BOQ line.
+        :param totals: dict {boq_line_id: [quantity, amount]} (net of refunds)
+        """
+        for line in self.browse(list(totals)):
+            qty, amount = totals[line.id]
+            if qty > 0 or amount > 0:
+                line.check_consumption(qty, amount)
+
     # -------------------------------------------------------------------------
     # PROPAGATE VERSIONING FROM LINE CHANGES
     # -------------------------------------------------------------------------
@@ -639,19 +989,491 @@ class ConstructionBOQLine(models.Model):
         if boq_ids and not self.env.context.get('revision_copy'):
             boqs = self.env['construction.boq'].browse(list(boq_ids))
             boqs.filtered(lambda b: b.state in ['submitted', 'approved', 'locked']).create_revision_snapshot()
-        return super(ConstructionBOQLine, self).create(vals_list)
+        lines = super(ConstructionBOQLine, self).create(vals_list)
+        lines.boq_id._bump_line_index_version()
+        return lines
 
     def write(self, vals):
         if not self.env.context.get('revision_copy'):
             boqs = self.mapped('boq_id')
             boqs.filtered(lambda b: b.state in ['submitted', 'approved', 'locked']).create_revision_snapshot()
-        return super(ConstructionBOQLine, self).write(vals)
+        bump_index = bool({'boq_id', 'product_id', 'display_type', 'sequence'}.intersection(vals))
+        old_boqs = self.boq_id
+        res = super(ConstructionBOQLine, self).write(vals)
+        if bump_index:
+            (old_boqs | self.boq_id)._bump_line_index_version()
+        return res
 
     def unlink(self):
         if not self.env.context.get('revision_copy'):
             boqs = self.mapped('boq_id')
             boqs.filtered(lambda b: b.state in ['submitted', 'approved', 'locked']).create_revision_snapshot()
-        return super(ConstructionBOQLine, self).unlink()
+        boqs_to_bump = self.boq_id
+        res = super(ConstructionBOQLine, self).unlink()
+        boqs_to_bump._bump_line_index_version()
+        return res
+
+    def _get_ordered_quantities(self):
+        """
+        Total non-cancelled Purchase Order quantity per BOQ line, converted
+        into each BOQ line's UoM, for the whole recordset in one grouped query.
+        UoM factors are relative to the category reference unit, so
+        qty / po_uom.factor * boq_uom.factor converts PO units into BOQ units.
+        Returns a dict {boq_line_id: ordered_qty}; lines without PO lines are absent.
+        """
+        line_ids = [line_id for line_id in self.ids if line_id]
+        if not line_ids:
+            return {}
+        self.env.cr.execute(self._ordered_quantity_query(line_ids))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _converted_quantity_query(self, model_name, qty_fname, uom_fname, where):
+        """
+        Query returning (line_id, qty): the sum of ``qty_fname`` of the
+        ``model_name`` rows (alias ``src``, linked through boq_line_id)
+        matching ``where``, converted into each BOQ line's UoM.
+        UoM factors are relative to the category reference unit, so
+        qty / src_uom.factor * boq_uom.factor converts source units into BOQ units.
+        """
+        Model = self.env[model_name]
+        Model.flush_model(['boq_line_id', qty_fname, uom_fname])
+        self.flush_model(['uom_id'])
+        return SQL(
+            """
+            SELECT src.boq_line_id AS line_id,
+                   SUM(
+                       CASE
+                           WHEN su.id IS NULL OR bu.id IS NULL OR su.id = bu.id
+                           THEN src.%(qty)s
+                           ELSE src.%(qty)s / su.factor * bu.factor
+                       END
+                   ) AS qty
+              FROM %(table)s src
+              JOIN construction_boq_line l ON l.id = src.boq_line_id
+         LEFT JOIN uom_uom su ON su.id = src.%(uom)s
+         LEFT JOIN uom_uom bu ON bu.id = l.uom_id
+             WHERE %(where)s
+          GROUP BY src.boq_line_id
+            """,
+            qty=SQL.identifier(qty_fname),
+            uom=SQL.identifier(uom_fname),
+            table=SQL.identifier(Model._table),
+            where=where,
+        )
+
+    @api.model
+    def _ordered_quantity_query(self, line_ids):
+        """(line_id, qty) of the non-cancelled Purchase Order quantities of the given lines, in the BOQ line UoM."""
+        self.env['purchase.order.line'].flush_model(['state'])
+        return self._converted_quantity_query(
+            'purchase.order.line', 'product_qty', 'product_uom',
+            SQL("src.boq_line_id = ANY(%s) AND COALESCE(src.state, 'draft') != 'cancel'", list(line_ids)),
+        )
+
+    # -------------------------------------------------------------------------
+    # DEFERRED RECOMPUTE (mass operations)
+    # -------------------------------------------------------------------------
+    # With the context key boq_defer_recompute, the ordered / remaining /
+    # consumed rollups of saved lines keep their stored value and the lines
+    # are collected in cr.precommit.data. They are rebuilt once, in SQL, by
+    # _flush_deferred_recompute(): explicitly, or at the latest just before
+    # the transaction commits. Budget checks read the real values of dirty
+    # lines through _refresh_deferred_rollups() without writing them.
+    def _boq_defer_recompute(self, fnames):
+        """
+        In defer mode, keep the stored values of ``fnames`` on saved product
+        lines and mark them dirty. Returns the records still to compute.
+        """
+        if not self.env.context.get('boq_defer_recompute'):
+            return self
+        deferred = self.filtered(lambda r: isinstance(r.id, int) and not r.display_type)
+        if not deferred:
+            return self
+
+        self._mark_rollups_dirty(deferred.ids)
+        self.env.cr.execute(SQL(
+            "SELECT id, %s FROM construction_boq_line WHERE id IN %s",
+            SQL(', ').join(SQL.identifier(fname) for fname in fnames),
+            tuple(deferred.ids),
+        ))
+        stored = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+        for rec in deferred:
+            for fname, value in zip(fnames, stored.get(rec.id, ())):
+                rec[fname] = value if value is not None else False
+        return self - deferred
+
+    def _mark_rollups_dirty(self, line_ids):
+        data = self.env.cr.precommit.data
+        dirty = data.get(DIRTY_LINES_KEY)
+        if dirty is None:
+            dirty = data[DIRTY_LINES_KEY] = set()
+            self.env.cr.precommit.add(self._precommit_deferred_recompute)
+        dirty.update(line_ids)
+
+    def _precommit_deferred_recompute(self):
+        self._flush_deferred_recompute()
+        # Precommit hooks run after the ORM flush: write the task / project
+        # rollups the rebuild marked to recompute before the commit.
+        self.env.flush_all()
+
+    def _refresh_deferred_rollups(self):
+        """
+        In defer mode, load the up-to-date rollups of the dirty lines among
+        these into the cache, so a budget check reads the real values. The
+        stored values are left as they are: the lines stay dirty until
+        _flush_deferred_recompute(). Call it after invalidating the lines.
+        """
+        if not self.env.context.get('boq_defer_recompute'):
+            return
+        # Pending computations only keep the stored values and mark the lines dirty
+        self.flush_recordset(DEFERRED_LINE_FIELDS)
+        dirty = self.env.cr.precommit.data.get(DIRTY_LINES_KEY)
+        line_ids = sorted(dirty.intersection(self.ids)) if dirty else []
+        if not line_ids:
+            return
+        values = self._read_line_rollups(line_ids)
+        lines = self.browse(list(values))
+        for index, fname in enumerate(DEFERRED_LINE_FIELDS):
+            self.env.cache.update(lines, self._fields[fname], [values[line.id][index] for line in lines])
+
+    @api.model
+    def _flush_deferred_recompute(self):
+        """Rebuild the rollups of the lines collected in defer mode. Returns their number."""
+        dirty = self.env.cr.precommit.data.pop(DIRTY_LINES_KEY, set())
+        # Pending recomputations of the deferred fields are replaced by the SQL rebuild
+        for fname in DEFERRED_LINE_FIELDS:
+            field = self._fields[fname]
+            pending = self.env.records_to_compute(field)
+            dirty.update(pending.ids)
+            self.env.remove_to_compute(field, pending)
+        if not dirty:
+            return 0
+        self._rebuild_line_rollups(sorted(dirty))
+        return len(dirty)
+
+    def _line_rollups_query(self, line_ids, query):
+        """
+        Run ``query`` after a ``rollups`` CTE giving, for the given product
+        lines, the values of DEFERRED_LINE_FIELDS computed with the same
+        formulas as their compute methods.
+        """
+        ordered_query = self._ordered_quantity_query(line_ids)
+        self.env['construction.boq.consumption'].flush_model(['boq_line_id', 'quantity', 'amount'])
+        self.flush_model(['quantity', 'additional_quantity', 'estimated_rate', 'budget_amount', 'uom_id', 'display_type'])
+        self.env.cr.execute(SQL("""
+            WITH ids AS (
+                SELECT unnest(%(ids)s::int[]) AS id
+            ), ordered AS (
+                %(ordered)s
+            ), consumed AS (
+                SELECT boq_line_id AS line_id, SUM(quantity) AS qty, SUM(amount) AS amount
+                  FROM construction_boq_consumption
+                 WHERE boq_line_id = ANY(%(ids)s)
+              GROUP BY boq_line_id
+            ), rollups AS (
+                SELECT l.id, l.boq_id, l.is_complete AS previous_is_complete,
+                       COALESCE(o.qty, 0.0) AS ordered_quantity,
+                       COALESCE(l.quantity, 0.0) + COALESCE(l.additional_quantity, 0.0) - COALESCE(o.qty, 0.0) AS remaining_quantity,
+                       COALESCE(l.quantity, 0.0) + COALESCE(l.additional_quantity, 0.0) - COALESCE(o.qty, 0.0) <= 0 AS is_complete,
+                       COALESCE(o.qty, 0.0) * COALESCE(l.estimated_rate, 0.0) AS committed_amount,
+                       COALESCE(c.qty, 0.0) AS consumed_quantity,
+                       COALESCE(c.amount, 0.0) AS consumed_amount,
+                       COALESCE(l.budget_amount, 0.0) - COALESCE(c.amount, 0.0) AS remaining_amount
+                  FROM ids
+                  JOIN construction_boq_line l ON l.id = ids.id
+             LEFT JOIN ordered o ON o.line_id = ids.id
+             LEFT JOIN consumed c ON c.line_id = ids.id
+                 WHERE l.display_type IS NULL
+            )
+            %(query)s
+        """, ids=list(line_ids), ordered=ordered_query, query=SQL(query)))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _read_line_rollups(self, line_ids):
+        """Up-to-date rollups of the given lines: {line_id: values in DEFERRED_LINE_FIELDS order}."""
+        rows = self._line_rollups_query(line_ids, "SELECT id, %s FROM rollups" % ', '.join(DEFERRED_LINE_FIELDS))
+        return {row[0]: row[1:] for row in rows}
+
+    @api.model
+    def _rebuild_line_rollups(self, line_ids):
+        """
+        Set-based rebuild of ordered_quantity, remaining_quantity, is_complete,
+        committed_amount, consumed_quantity, consumed_amount and remaining_amount for the given
+        lines, with the same formulas as their compute methods.
+        """
+        line_ids = [line_id for line_id in line_ids if isinstance(line_id, int)]
+        if not line_ids:
+            return self.browse()
+
+        rows = self._line_rollups_query(line_ids, """
+            UPDATE construction_boq_line l
+               SET %s
+              FROM rollups r
+             WHERE l.id = r.id
+         RETURNING l.id, l.boq_id, r.is_complete IS DISTINCT FROM r.previous_is_complete
+        """ % ', '.join('%s = r.%s' % (fname, fname) for fname in DEFERRED_LINE_FIELDS))
+
+        lines = self.browse([row[0] for row in rows])
+        lines.invalidate_recordset(DEFERRED_LINE_FIELDS)
+        # Propagate to the stored fields of other models (task / project rollups),
+        # the line fields themselves are already up to date.
+        lines.modified(DEFERRED_LINE_FIELDS)
+        for fname in DEFERRED_LINE_FIELDS:
+            self.env.remove_to_compute(self._fields[fname], lines)
+        self.env['construction.boq'].browse({row[1] for row in rows if row[2]})._bump_line_index_version()
+        return lines
+
+    @api.model
+    def _action_start_rebuild_all(self):
+        """Schedule a rebuild of the rollups of every line (e.g. after an upgrade)."""
+        self.env['ir.config_parameter'].sudo().set_param(REBUILD_CURSOR_PARAM, '0')
+        self.env.ref('sitemate.ir_cron_boq_line_rebuild_rollups')._trigger()
+
+    @api.model
+    def _cron_rebuild_line_rollups(self, chunk_size=5000, max_chunks=100):
+        """
+        Work through all lines in id-ordered chunks, one transaction per chunk.
+        Progress is kept in a system parameter, so an interrupted run resumes
+        where it stopped; the parameter row is locked so only one job runs.
+        """
+        # No intermediate commits while the test suite runs
+        auto_commit = not modules.module.current_test
+        ICP = self.env['ir.config_parameter'].sudo()
+        for _chunk in range(max_chunks):
+            self.env.cr.execute("""
+                SELECT value FROM ir_config_parameter WHERE key = %s FOR UPDATE SKIP LOCKED
+            """, (REBUILD_CURSOR_PARAM,))
+            row = self.env.cr.fetchone()
+            if not row or not row[0]:
+                return
+            last_id = int(row[0])
+
+            self.env.cr.execute("""
+                SELECT id FROM construction_boq_line WHERE id > %s ORDER BY id LIMIT %s
+            """, (last_id, chunk_size))
+            ids = [r[0] for r in self.env.cr.fetchall()]
+            if not ids:
+                ICP.set_param(REBUILD_CURSOR_PARAM, False)
+                return
+
+            self._rebuild_line_rollups(ids)
+            ICP.set_param(REBUILD_CURSOR_PARAM, str(ids[-1]))
+            if auto_commit:
+                self.env.cr.execute("SELECT COUNT(*) FROM construction_boq_line WHERE id > %s", (ids[-1],))
+                self.env['ir.cron']._notify_progress(done=len(ids), remaining=self.env.cr.fetchone()[0])
+                self.env.cr.commit()
+
+    def init(self):
+        # Serves the (project, product) lookups of eligible lines as a single index scan
+        tools.create_index(
+            self.env.cr,
+            'construction_boq_line_project_eligible_product_idx',
+            self._table,
+            ['project_id', 'is_boq_eligible', 'product_id'],
+        )
+
+    # -------------------------------------------------------------------------
+    # BULK MATCHING HELPERS
+    # -------------------------------------------------------------------------
+    @api.model
+    def _get_project_product_index(self, project_ids, product_ids):
+        """
+        Build an in-memory {(project_id, product_id): boq_line_id} index of the
+        active (Approved/Locked) BOQ lines for the given projects and products.
+        One search for the whole batch; the first line by sequence wins.
+        """
+        if not project_ids or not product_ids:
+            return {}
+
+        lines = self.search_fetch([
+            ('project_id', 'in', list(project_ids)),
+            ('product_id', 'in', list(product_ids)),
+            ('is_boq_eligible', '=', True),
+        ], ['project_id', 'product_id'])
+
+        index = {}
+        for line in lines:
+            index.setdefault((line.project_id.id, line.product_id.id), line.id)
+        return index
+
+    @api.model
+    def _get_analytic_matching_index(self, analytic_account_ids):
+        """
+        Lookup index of the active (Approved/Locked) BOQ lines of the projects
+        behind the given analytic accounts, for matching bill lines.
+        Returns (by_product, by_code) where
+          by_product maps (analytic_account_id, product_id) -> {boq_line_id, ...}
+          by_code maps (analytic_account_id, ACTIVITY_CODE) -> {boq_line_id, ...}
+        """
+        by_product = defaultdict(set)
+        by_code = defaultdict(set)
+        if not analytic_account_ids:
+            return by_product, by_code
+
+        lines = self.search_fetch([
+            ('analytic_account_id', 'in', list(analytic_account_ids)),
+            ('is_boq_eligible', '=', True),
+        ], ['analytic_account_id', 'product_id', 'activity_code'])
+
+        for line in lines:
+            analytic_id = line.analytic_account_id.id
+            if line.product_id:
+                by_product[(analytic_id, line.product_id.id)].add(line.id)
+            if line.activity_code:
+                by_code[(analytic_id, line.activity_code.strip().upper())].add(line.id)
+        return by_product, by_code
+
+    # -------------------------------------------------------------------------
+    # BULK TASK <-> BOQ LINE LINKING
+    # -------------------------------------------------------------------------
+    @api.model
+    def _link_tasks_by_activity_code(self, project_ids):
+        """
+        Set-based linking of BOQ lines and project tasks on (project_id, activity_code):
+        1. lines with a task but no code take the task's code;
+        2. tasks without a code take the code of their lines (when unambiguous);
+        3. lines with a code but no task are linked to the task with that code.
+        Only lines of active draft BOQs are updated: archived revisions are
+        history, and submitted / approved / locked BOQs change through a revision.
+        Returns {'coded_lines': n, 'coded_tasks': n, 'linked_lines': n,
+                 'locked_lines': n, 'unmatched': {project_id: [codes]}}.
+        """
+        project_ids = list(project_ids)
+        report = {'coded_lines': 0, 'coded_tasks': 0, 'linked_lines': 0, 'locked_lines': 0, 'unmatched': {}}
+        if not project_ids:
+            return report
+
+        Task = self.env['project.task']
+        self.flush_model(['project_id', 'task_id', 'activity_code', 'display_type', 'boq_active', 'boq_state'])
+        Task.flush_model(['project_id', 'activity_code', 'active'])
+        cr = self.env.cr
+
+        # 1. Line code from its task
+        cr.execute("""
+            SELECT l.id, t.activity_code
+              FROM construction_boq_line l
+              JOIN project_task t ON t.id = l.task_id
+             WHERE l.project_id = ANY(%s)
+               AND l.boq_active AND l.boq_state = 'draft'
+               AND l.display_type IS NULL
+               AND COALESCE(TRIM(l.activity_code), '') = ''
+               AND COALESCE(t.activity_code, '') != ''
+        """, (project_ids,))
+        coded_lines = dict(cr.fetchall())
+        self._write_link_column(self.browse(), 'activity_code', coded_lines)
+
+        # 2. Task code from its lines, only when the code is unambiguous and free
+        cr.execute("""
+            WITH src AS (
+                SELECT l.project_id, UPPER(TRIM(l.activity_code)) AS code, MIN(l.task_id) AS task_id
+                  FROM construction_boq_line l
+                 WHERE l.project_id = ANY(%s)
+                   AND l.boq_active
+                   AND l.display_type IS NULL
+                   AND l.task_id IS NOT NULL
+                   AND COALESCE(TRIM(l.activity_code), '') != ''
+              GROUP BY l.project_id, UPPER(TRIM(l.activity_code))
+                HAVING COUNT(DISTINCT l.task_id) = 1
+            ), single AS (
+                SELECT task_id FROM src GROUP BY task_id HAVING COUNT(*) = 1
+            )
+            SELECT t.id, src.code
+              FROM project_task t
+              JOIN src ON src.task_id = t.id
+              JOIN single ON single.task_id = src.task_id
+             WHERE COALESCE(t.activity_code, '') = ''
+               AND NOT EXISTS (
+                       SELECT 1 FROM project_task o
+                        WHERE o.project_id = src.project_id AND o.activity_code = src.code
+                   )
+        """, (project_ids,))
+        coded_tasks = dict(cr.fetchall())
+        self._write_link_column(Task, 'activity_code', coded_tasks)
+
+        # 3. Line task from its code
+        cr.execute("""
+            SELECT l.id, t.id, l.boq_state = 'draft'
+              FROM construction_boq_line l
+              JOIN project_task t
+                ON t.project_id = l.project_id
+               AND t.activity_code = UPPER(TRIM(l.activity_code))
+               AND t.active
+             WHERE l.project_id = ANY(%s)
+               AND l.boq_active
+               AND l.display_type IS NULL
+               AND l.task_id IS NULL
+               AND COALESCE(TRIM(l.activity_code), '') != ''
+        """, (project_ids,))
+        linked_lines = {}
+        for line_id, task_id, is_draft in cr.fetchall():
+            if is_draft:
+                linked_lines[line_id] = task_id
+            else:
+                report['locked_lines'] += 1
+        self._write_link_column(self.browse(), 'task_id', linked_lines)
+
+        # Codes without a task
+        cr.execute("""
+            SELECT project_id, ARRAY_AGG(DISTINCT UPPER(TRIM(activity_code)))
+              FROM construction_boq_line
+             WHERE project_id = ANY(%s)
+               AND boq_active
+               AND display_type IS NULL
+               AND task_id IS NULL
+               AND COALESCE(TRIM(activity_code), '') != ''
+          GROUP BY project_id
+        """, (project_ids,))
+        report['unmatched'] = dict(cr.fetchall())
+
+        report.update(
+            coded_lines=len(coded_lines),
+            coded_tasks=len(coded_tasks),
+            linked_lines=len(linked_lines),
+        )
+        return report
+
+    def _write_link_column(self, model, fname, values):
+        """
+        Set ``fname`` of the ``model`` records given as {id: value} in one
+        UPDATE, with the dependent fields notified before and after the change.
+        """
+        if not values:
+            return
+        records = model.browse(list(values))
+        records.modified([fname], before=True)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE %(table)s
+               SET %(column)s = v.value, write_uid = %(uid)s, write_date = (now() at time zone 'UTC')
+              FROM (SELECT unnest(%(ids)s) AS id, unnest(%(values)s) AS value) v
+             WHERE %(table)s.id = v.id
+            """,
+            table=SQL.identifier(model._table),
+            column=SQL.identifier(fname),
+            uid=self.env.uid,
+            ids=list(values),
+            values=list(values.values()),
+        ))
+        records.invalidate_recordset([fname, 'write_uid', 'write_date'])
+        field = model._fields[fname]
+        if field.type == 'many2one':
+            # Cached one2many inverses (e.g. task.boq_line_ids) do not see the UPDATE
+            comodel = self.env[field.comodel_name]
+            comodel.invalidate_model([
+                f.name for f in comodel._fields.values()
+                if f.type == 'one2many' and f.comodel_name == model._name and f.inverse_name == fname
+            ])
+        records.modified([fname])
+
+    @api.model
+    def load(self, fields, data):
+        """Link imported BOQ lines to their tasks by activity code."""
+        res = super(ConstructionBOQLine, self).load(fields, data)
+        if res.get('ids'):
+            self._link_tasks_by_activity_code(self.browse(res['ids']).project_id.ids)
+        return res
 
     def action_open_advanced_view(self):
         self.ensure_one()
@@ -688,20 +1510,24 @@ class ConstructionBOQConsumption(models.Model):
     def create(self, vals_list):
         line_ids = {vals['boq_line_id'] for vals in vals_list if vals.get('boq_line_id')}
         lines = self.env['construction.boq.line'].browse(list(line_ids))
-        line_map = {line.id: line for line in lines}
-        
+
+        # [FIX] Do not process consumption for Sections
+        if lines.filtered('display_type'):
+            raise ValidationError(_("Cannot record consumption on a Section/Note BOQ line."))
+
+        # Serialize with the other consumption paths, then aggregate the batch
+        # per BOQ line and validate each line once
+        self.env['construction.boq.lock']._lock_lines(lines.ids, 'construction.boq.consumption.create')
+        lines.invalidate_recordset(['remaining_quantity', 'remaining_amount'])
+        lines._refresh_deferred_rollups()
+        totals = defaultdict(lambda: [0.0, 0.0])
         for vals in vals_list:
             line_id = vals.get('boq_line_id')
-            if line_id and line_id in line_map:
-                line = line_map[line_id]
-                # [FIX] Do not process consumption for Sections
-                if line.display_type:
-                        raise ValidationError(_("Cannot record consumption on a Section/Note BOQ line."))
-
-                qty = vals.get('quantity', 0.0)
-                amt = vals.get('amount', 0.0)
-                if qty > 0 or amt > 0:
-                    line.check_consumption(qty, amt)
+            if line_id:
+                totals[line_id][0] += vals.get('quantity', 0.0)
+                totals[line_id][1] += vals.get('amount', 0.0)
+        lines._check_consumption_totals(totals)
+
         return super(ConstructionBOQConsumption, self).create(vals_list)
     
     def init(self):
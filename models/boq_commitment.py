@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from collections import defaultdict
+
+class ConstructionBOQCommitment(models.Model):
+    _name = 'construction.boq.commitment'
+    _description = 'BOQ Commitment Checkpoint'
+    _order = 'date desc, id desc'
+
+    # Lightweight alternative to a full BOQ revision: records the ordered
+    # totals of the BOQ lines affected by a batch of confirmed Purchase Orders.
+    boq_id = fields.Many2one('construction.boq', string='BOQ Reference', required=True, readonly=True, ondelete='cascade', index=True)
+    project_id = fields.Many2one('project.project', related='boq_id.project_id', string='Project', store=True, readonly=True)
+    company_id = fields.Many2one('res.company', related='boq_id.company_id', string='Company', store=True, readonly=True)
+
+    date = fields.Datetime(string='Date', default=fields.Datetime.now, required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='Confirmed By', default=lambda self: self.env.user, readonly=True)
+    boq_version = fields.Integer(string='BOQ Version', readonly=True)
+
+    purchase_order_ids = fields.Many2many('purchase.order', string='Purchase Orders', readonly=True)
+    ordered_totals = fields.Json(
+        string='Ordered Totals',
+        readonly=True,
+        help="Ordered quantity per BOQ line ({boq_line_id: quantity}) right after the confirmation."
+    )
+    line_count = fields.Integer(string='Lines', readonly=True)
+
+    @api.model
+    def _record_checkpoints(self, orders):
+        """
+        Create one checkpoint per BOQ for a batch of confirmed BOQ Purchase Orders.
+        Only the BOQ lines referenced by the orders are recorded.
+        """
+        orders = orders.filtered(lambda o: o.purchase_type == 'boq' and o.boq_id)
+        if not orders:
+            return self.browse()
+
+        orders_by_boq = defaultdict(lambda: self.env['purchase.order'])
+        for order in orders:
+            orders_by_boq[order.boq_id] |= order
+
+        vals_list = []
+        for boq, boq_orders in orders_by_boq.items():
+            lines = boq_orders.order_line.boq_line_id.filtered(lambda l: l.boq_id == boq)
+            vals_list.append({
+                'boq_id': boq.id,
+                'boq_version': boq.version,
+                'purchase_order_ids': [(6, 0, boq_orders.ids)],
+                'ordered_totals': {str(line.id): line.ordered_quantity for line in lines},
+                'line_count': len(lines),
+            })
+        # Purchase users are not necessarily members of the construction groups
+        return self.sudo().create(vals_list)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import defaultdict
+
+from odoo import models, modules, fields, api
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+
+class ConstructionBOQLedgerQueue(models.Model):
+    _name = 'construction.boq.ledger.queue'
+    _description = 'Deferred BOQ Ledger Posting Queue'
+    _order = 'id'
+
+    # One row per ledger entry to write. Rows are claimed with
+    # FOR UPDATE SKIP LOCKED and flipped to 'done' in the same transaction
+    # that creates their consumption row, so each entry is written exactly once
+    # even with several workers draining the queue in parallel.
+    boq_line_id = fields.Many2one('construction.boq.line', string='BOQ Line', required=True, readonly=True, ondelete='cascade', index=True)
+    company_id = fields.Many2one('res.company', related='boq_line_id.company_id', string='Company', store=True, readonly=True)
+    move_id = fields.Many2one('account.move', string='Journal Entry', readonly=True, ondelete='set null', index=True)
+
+    source_model = fields.Char(string='Source Model', required=True, readonly=True)
+    source_id = fields.Integer(string='Source ID', required=True, readonly=True)
+    quantity = fields.Float(string='Quantity', readonly=True)
+    amount = fields.Monetary(string='Amount', currency_field='currency_id', readonly=True)
+    currency_id = fields.Many2one('res.currency', related='boq_line_id.currency_id', store=True)
+    date = fields.Date(string='Date', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    strict = fields.Boolean(string='Budget Checked', readonly=True, help="Budget was already validated when the entry was posted.")
+    consumption_id = fields.Many2one('construction.boq.consumption', string='Ledger Entry', readonly=True)
+    error_message = fields.Text(string='Error', readonly=True)
+    processed_date = fields.Datetime(string='Processed On', readonly=True)
+
+    @api.model
+    def _enqueue(self, vals_list, move_by_source=None, strict=False):
+        """
+        Queue consumption ledger values (same keys as construction.boq.consumption).
+        :param move_by_source: optional {source_id: account.move id}
+        """
+        move_by_source = move_by_source or {}
+        return self.sudo().create([dict(
+            vals,
+            move_id=move_by_source.get(vals['source_id']),
+            strict=strict,
+        ) for vals in vals_list])
+
+    @api.model
+    def _get_pending_totals(self, line_ids):
+        """Queued but not yet written {boq_line_id: [quantity, amount]}."""
+        if not line_ids:
+            return {}
+        groups = self.sudo()._read_group(
+            [('boq_line_id', 'in', list(line_ids)), ('state', '=', 'pending')],
+            ['boq_line_id'], ['quantity:sum', 'amount:sum'],
+        )
+        return {line.id: [qty, amount] for line, qty, amount in groups}
+
+    # -------------------------------------------------------------------------
+    # WORKER
+    # -------------------------------------------------------------------------
+    @api.model
+    def _cron_process_ledger_queue(self, batch_size=1000, max_batches=50):
+        """
+        Drain the queue in batches. Several cron jobs may run this method at
+        the same time; SKIP LOCKED hands each of them a disjoint batch.
+        """
+        # No intermediate commits while the test suite runs
+        auto_commit = not modules.module.current_test
+        for _batch in range(max_batches):
+            self.env.cr.execute("""
+                SELECT id FROM construction_boq_ledger_queue
+                 WHERE state = 'pending'
+              ORDER BY boq_line_id, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+
+            self.browse(ids)._process_items()
+
+            if auto_commit:
+                remaining = self.search_count([('state', '=', 'pending')])
+                self.env['ir.cron']._notify_progress(done=len(ids), remaining=remaining)
+                self.env.cr.commit()
+
+    def _process_items(self):
+        """
+        Write the ledger rows of the claimed items. The whole batch is written
+        in one consolidated create (one lock and one budget check per BOQ line);
+        if that fails, lines are retried one by one so a single over-budget
+        line only fails its own items.
+        """
+        items = self.filtered(lambda i: i.state == 'pending')
+        if not items:
+            return
+
+        try:
+            with self.env.cr.savepoint():
+                items._write_ledger()
+            return
+        except (UserError, ValidationError) as e:
+            if len(items.boq_line_id) == 1:
+                items._mark_failed(e)
+                return
+            _logger.info("Deferred BOQ ledger batch rejected, retrying %d lines one by one", len(items.boq_line_id))
+
+        items_by_line = defaultdict(lambda: self.browse())
+        for item in items:
+            items_by_line[item.boq_line_id] |= item
+
+        for line_items in items_by_line.values():
+            try:
+                with self.env.cr.savepoint():
+                    line_items._write_ledger()
+            except (UserError, ValidationError) as e:
+                line_items._mark_failed(e)
+
+    def _write_ledger(self):
+        consumptions = self.env['construction.boq.consumption'].create([{
+            'boq_line_id': item.boq_line_id.id,
+            'source_model': item.source_model,
+            'source_id': item.source_id,
+            'quantity': item.quantity,
+            'amount': item.amount,
+            'date': item.date,
+            'user_id': item.user_id.id,
+        } for item in self])
+
+        self.write({
+            'state': 'done',
+            'error_message': False,
+            'processed_date': fields.Datetime.now(),
+        })
+        # Link each item to its ledger row in one statement
+        self.flush_recordset()
+        self.env.cr.execute("""
+            UPDATE construction_boq_ledger_queue q
+               SET consumption_id = v.consumption_id
+              FROM unnest(%s::int[], %s::int[]) AS v(queue_id, consumption_id)
+             WHERE q.id = v.queue_id
+        """, (self.ids, consumptions.ids))
+        self.invalidate_recordset(['consumption_id'])
+
+    def _mark_failed(self, error):
+        self.write({
+            'state': 'failed',
+            'error_message': str(error),
+            'processed_date': fields.Datetime.now(),
+        })
+
+    def action_retry(self):
+        self.filtered(lambda i: i.state == 'failed').write({'state': 'pending', 'error_message': False})
+        return True
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from psycopg2.errors import LockNotAvailable
+
+from odoo import models, api, _
+from odoo.exceptions import UserError
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory locks taken on BOQ lines (arbitrary, module specific)
+ADVISORY_LOCK_NAMESPACE = 51730
+
+# In-process lock-wait metrics, per calling path
+_lock_stats_guard = threading.Lock()
+_lock_stats = defaultdict(lambda: {
+    'calls': 0, 'lines': 0, 'retries': 0, 'failures': 0,
+    'wait_total_ms': 0.0, 'wait_max_ms': 0.0,
+})
+
+
+class ConstructionBOQLock(models.AbstractModel):
+    _name = 'construction.boq.lock'
+    _description = 'BOQ Line Locking Service'
+
+    # Single entry point used by every consumption path (bills, stock issues,
+    # PO limit checks, direct ledger writes). Lines are always locked in
+    # ascending id order, so two transactions can never wait on each other
+    # in opposite order.
+    #
+    # Row locks are FOR NO KEY UPDATE: callers usually lock after inserting a
+    # row referencing the line (PO line, ledger entry), and that INSERT holds
+    # FOR KEY SHARE on it through the foreign key. NO KEY UPDATE does not
+    # conflict with KEY SHARE, so two such transactions queue on the lock
+    # instead of deadlocking on each other's foreign key locks.
+    #
+    # System parameters:
+    #   sitemate.boq_lock_mode         wait (default) | nowait | timeout
+    #   sitemate.boq_lock_timeout_ms   lock_timeout used in 'timeout' mode (default 2000)
+    #   sitemate.boq_lock_retries      bounded retries in nowait/timeout modes (default 3)
+    #   sitemate.boq_lock_advisory     use per-line advisory locks instead of row locks
+    #   sitemate.boq_lock_slow_ms      log waits longer than this (default 500)
+
+    @api.model
+    def _get_lock_settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        return {
+            'mode': ICP.get_param('sitemate.boq_lock_mode', 'wait'),
+            'timeout_ms': int(ICP.get_param('sitemate.boq_lock_timeout_ms', 2000)),
+            'retries': int(ICP.get_param('sitemate.boq_lock_retries', 3)),
+            'advisory': str2bool(ICP.get_param('sitemate.boq_lock_advisory', 'False'), False),
+            'slow_ms': float(ICP.get_param('sitemate.boq_lock_slow_ms', 500)),
+        }
+
+    @api.model
+    def _lock_lines(self, line_ids, path='unknown'):
+        """
+        Lock the given BOQ lines for the rest of the transaction.
+        :param line_ids: iterable of construction.boq.line ids
+        :param path: name of the calling code path, used for metrics
+        :raise UserError: if the lines stay busy after the bounded retries
+        """
+        ids = sorted({line_id for line_id in line_ids if isinstance(line_id, int)})
+        if not ids:
+            return
+
+        settings = self._get_lock_settings()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                with self.env.cr.savepoint(flush=False):
+                    self._acquire_line_locks(ids, settings)
+                break
+            except LockNotAvailable:
+                attempt += 1
+                if attempt > settings['retries']:
+                    self._record_lock_wait(path, len(ids), start, attempt - 1, settings, failed=True)
+                    raise UserError(_(
+                        "These BOQ lines are being updated by another transaction. "
+                        "Please try again in a moment."
+                    ))
+                # Exponential backoff with jitter, capped at one second
+                time.sleep(min(0.05 * (2 ** attempt), 1.0) * (0.5 + random.random()))
+
+        self._record_lock_wait(path, len(ids), start, attempt, settings)
+
+    def _acquire_line_locks(self, ids, settings):
+        cr = self.env.cr
+        nowait = settings['mode'] == 'nowait'
+
+        if settings['advisory']:
+            if nowait:
+                cr.execute("""
+                    SELECT bool_and(pg_try_advisory_xact_lock(%s, line_id))
+                      FROM (SELECT unnest(%s::int[]) AS line_id ORDER BY 1) ids
+                """, (ADVISORY_LOCK_NAMESPACE, ids))
+                if not cr.fetchone()[0]:
+                    raise LockNotAvailable()
+                return
+            query = """
+                SELECT pg_advisory_xact_lock(%s, line_id)
+                  FROM (SELECT unnest(%s::int[]) AS line_id ORDER BY 1) ids
+            """
+            params = (ADVISORY_LOCK_NAMESPACE, ids)
+        else:
+            query = """
+                SELECT id FROM construction_boq_line
+                WHERE id IN %s ORDER BY id FOR NO KEY UPDATE{}
+            """.format(' NOWAIT' if nowait else '')
+            params = (tuple(ids),)
+
+        if settings['mode'] == 'timeout':
+            cr.execute("SHOW lock_timeout")
+            previous_timeout = cr.fetchone()[0]
+            cr.execute("SET LOCAL lock_timeout = %s", ('%dms' % settings['timeout_ms'],))
+            cr.execute(query, params)
+            # On failure the savepoint rollback restores the previous timeout
+            cr.execute("SET LOCAL lock_timeout = %s", (previous_timeout,))
+        else:
+            cr.execute(query, params)
+
+    def _record_lock_wait(self, path, line_count, start, retries, settings, failed=False):
+        wait_ms = (time.perf_counter() - start) * 1000.0
+        with _lock_stats_guard:
+            stats = _lock_stats[path]
+            stats['calls'] += 1
+            stats['lines'] += line_count
+            stats['retries'] += retries
+            stats['failures'] += int(failed)
+            stats['wait_total_ms'] += wait_ms
+            stats['wait_max_ms'] = max(stats['wait_max_ms'], wait_ms)
+
+        if failed or wait_ms >= settings['slow_ms']:
+            _logger.warning(
+                "BOQ lock contention on %s: waited %.1f ms for %d line(s), %d retr%s%s",
+                path, wait_ms, line_count, retries, 'y' if retries == 1 else 'ies',
+                ' - gave up' if failed else '',
+            )
+
+    @api.model
+    def _get_lock_stats(self):
+        """Snapshot of the lock-wait metrics of this worker, per calling path."""
+        with _lock_stats_guard:
+            return {path: dict(stats) for path, stats in _lock_stats.items()}
+
+    @api.model
+    def _reset_lock_stats(self):
+        with _lock_stats_guard:
+            _lock_stats.clear()
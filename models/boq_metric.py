@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import functools
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+from odoo import models, fields, api
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+# Opt-in instrumentation of the SiteMate overrides and computes.
+#
+# System parameters:
+#   sitemate.profiling_enabled         record timings (default False)
+#   sitemate.profiling_sample_rate     fraction of calls recorded, 0..1 (default 1.0)
+#   sitemate.profiling_retention_days  metrics older than this are purged (default 30)
+#
+# Samples are only appended to a bounded in-memory ring buffer per database:
+# the instrumented business methods never open a cursor, write or commit for
+# them. The flush cron writes the buffer of the process it runs in to
+# construction.boq.metric; when the buffer is full the oldest samples are
+# dropped. When disabled, the cost of a decorated call is one cached
+# parameter lookup.
+
+METRIC_BUFFER_SIZE = 10000
+
+_metric_buffers_guard = threading.Lock()
+_metric_buffers = defaultdict(lambda: deque(maxlen=METRIC_BUFFER_SIZE))
+
+
+def _get_buffer(dbname):
+    with _metric_buffers_guard:
+        return _metric_buffers[dbname]
+
+
+def _profiling_settings(env):
+    ICP = env['ir.config_parameter'].sudo()
+    if not str2bool(ICP.get_param('sitemate.profiling_enabled', 'False'), False):
+        return None
+    return float(ICP.get_param('sitemate.profiling_sample_rate', 1.0))
+
+
+def profiled(path):
+    """
+    Record wall time, query count and record count of the decorated method
+    under ``path`` when profiling is enabled.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            sample_rate = _profiling_settings(self.env)
+            if sample_rate is None or (sample_rate < 1.0 and random.random() >= sample_rate):
+                return method(self, *args, **kwargs)
+
+            cr = self.env.cr
+            queries_before = cr.sql_log_count
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _get_buffer(cr.dbname).append({
+                    'path': path,
+                    'date': fields.Datetime.now(),
+                    'duration_ms': (time.perf_counter() - start) * 1000.0,
+                    'query_count': cr.sql_log_count - queries_before,
+                    'record_count': len(self),
+                    'user_id': self.env.uid,
+                })
+        return wrapper
+    return decorator
+
+
+class ConstructionBOQMetric(models.Model):
+    _name = 'construction.boq.metric'
+    _description = 'SiteMate Performance Metric'
+    _order = 'date desc, id desc'
+    _rec_name = 'path'
+
+    path = fields.Char(string='Code Path', required=True, readonly=True, index=True)
+    date = fields.Datetime(string='Date', required=True, readonly=True, index=True)
+    duration_ms = fields.Float(string='Duration (ms)', readonly=True, aggregator='avg', digits=(16, 2))
+    query_count = fields.Integer(string='Queries', readonly=True, aggregator='avg')
+    record_count = fields.Integer(string='Records', readonly=True, aggregator='avg')
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+
+    @api.model
+    def _flush_buffer(self):
+        """Write the samples buffered by this worker for the current database."""
+        buffer = _get_buffer(self.env.cr.dbname)
+        samples = []
+        while buffer:
+            try:
+                samples.append(buffer.popleft())
+            except IndexError:
+                break
+        if samples:
+            try:
+                with self.env.cr.savepoint():
+                    self.sudo().create(samples)
+            except Exception:
+                # Samples are diagnostics: drop them rather than fail the job
+                _logger.exception("Could not write %s SiteMate performance metric(s)", len(samples))
+                return 0
+        return len(samples)
+
+    @api.model
+    def _cron_flush_metrics(self):
+        """Persist the buffered samples and purge the metrics past their retention."""
+        self._flush_buffer()
+        try:
+            with self.env.cr.savepoint():
+                retention_days = int(self.env['ir.config_parameter'].sudo().get_param('sitemate.profiling_retention_days', 30))
+                self.sudo().search([('date', '<', fields.Datetime.subtract(fields.Datetime.now(), days=retention_days))]).unlink()
+        except Exception:
+            _logger.exception("Could not purge old SiteMate performance metrics")
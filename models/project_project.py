@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+
+
+class ProjectProject(models.Model):
+    _inherit = 'project.project'
+
+    # -- BOQ Budget KPIs --
+    # Stored on the project and kept up to date by the ORM from the BOQ line
+    # rollups, so dashboards read them from project_project alone.
+    boq_line_ids = fields.One2many('construction.boq.line', 'project_id', string='BOQ Lines')
+    boq_currency_id = fields.Many2one('res.currency', string='BOQ Currency', compute='_compute_boq_currency_id')
+    boq_budget_total = fields.Monetary(
+        string='BOQ Budget', compute='_compute_boq_kpis', store=True, currency_field='boq_currency_id',
+        help="Budget of the lines of the active Approved/Locked BOQs of the project.")
+    boq_committed_amount = fields.Monetary(
+        string='Committed', compute='_compute_boq_kpis', store=True, currency_field='boq_currency_id',
+        help="Ordered quantity valued at the budget rate.")
+    boq_consumed_amount = fields.Monetary(
+        string='Consumed', compute='_compute_boq_kpis', store=True, currency_field='boq_currency_id',
+        help="Amount consumed on the BOQ lines.")
+    boq_budget_variance = fields.Monetary(
+        string='Budget Variance', compute='_compute_boq_kpis', store=True, currency_field='boq_currency_id',
+        help="Budget minus consumed amount. Negative means over budget.")
+    boq_progress = fields.Float(
+        string='BOQ Progress (%)', compute='_compute_boq_kpis', store=True, digits=(16, 2),
+        help="Consumed amount over budget, capped at 100%.")
+    boq_over_budget_line_count = fields.Integer(
+        string='Over Budget Lines', compute='_compute_boq_kpis', store=True,
+        help="Number of BOQ lines whose consumed amount exceeds their budget.")
+
+    @api.depends('company_id')
+    def _compute_boq_currency_id(self):
+        for project in self:
+            project.boq_currency_id = project.company_id.currency_id or self.env.company.currency_id
+
+    @api.depends(
+        'boq_line_ids.is_boq_eligible', 'boq_line_ids.budget_amount',
+        'boq_line_ids.committed_amount', 'boq_line_ids.consumed_amount', 'boq_line_ids.remaining_amount',
+    )
+    def _compute_boq_kpis(self):
+        totals = {}
+        over_budget = {}
+        project_ids = [project_id for project_id in self.ids if project_id]
+        if project_ids:
+            # Two grouped queries for the whole batch, on the product lines of
+            # active Approved/Locked BOQs: drafts and archived revisions are skipped
+            Line = self.env['construction.boq.line']
+            domain = [('project_id', 'in', project_ids), ('is_boq_eligible', '=', True)]
+            for project, budget, committed, consumed in Line._read_group(
+                domain, ['project_id'], ['budget_amount:sum', 'committed_amount:sum', 'consumed_amount:sum'],
+            ):
+                totals[project.id] = (budget, committed, consumed)
+            for project, count in Line._read_group(domain + [('remaining_amount', '<', 0)], ['project_id'], ['__count']):
+                over_budget[project.id] = count
+
+        for project in self:
+            budget, committed, consumed = totals.get(project.id, (0.0, 0.0, 0.0))
+            project.boq_budget_total = budget
+            project.boq_committed_amount = committed
+            project.boq_consumed_amount = consumed
+            project.boq_budget_variance = budget - consumed
+            project.boq_progress = min(consumed / budget * 100.0, 100.0) if budget > 0 else 0.0
+            project.boq_over_budget_line_count = over_budget.get(project.id, 0)
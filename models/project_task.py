@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+from odoo.osv import expression
+from odoo.tools.sql import escape_psql
+
+
+def _boq_planned_dates_depends(model):
+    # planned_date_begin only exists when the planning/Gantt app is installed
+    return ['planned_date_begin'] if 'planned_date_begin' in model._fields else []
 
 
 class ProjectTask(models.Model):
@@ -9,39 +17,128 @@ class ProjectTask(models.Model):
     activity_code = fields.Char(
         string='Activity Code',
         help="Code used to link with BOQ lines for cost control.",
-        index=True,  # Added index for faster searches/filtering
+        index='trigram',  # Fast ILIKE on codes; prefix lookups use the index created in init()
         copy=False  # Prevent copying when duplicating tasks
     )
 
+    # -- BOQ Cost Control (Earned Value) --
+    boq_line_ids = fields.One2many('construction.boq.line', 'task_id', string='BOQ Lines')
+    boq_currency_id = fields.Many2one('res.currency', string='BOQ Currency', compute='_compute_boq_currency_id')
+    boq_budget_amount = fields.Monetary(
+        string='BOQ Budget', compute='_compute_boq_costs', store=True, currency_field='boq_currency_id',
+        help="Budget at completion: budget of the lines of active Approved/Locked BOQs linked to this task.")
+    boq_committed_amount = fields.Monetary(
+        string='Committed', compute='_compute_boq_costs', store=True, currency_field='boq_currency_id',
+        help="Ordered quantity valued at the budget rate.")
+    boq_actual_cost = fields.Monetary(
+        string='Actual Cost (AC)', compute='_compute_boq_costs', store=True, currency_field='boq_currency_id',
+        help="Amount consumed on the linked BOQ lines.")
+    boq_earned_value = fields.Monetary(
+        string='Earned Value (EV)', compute='_compute_boq_costs', store=True, currency_field='boq_currency_id',
+        help="Budget of the work performed, from the consumed quantity of each line.")
+    boq_cpi = fields.Float(
+        string='CPI', compute='_compute_boq_costs', store=True, digits=(16, 2),
+        help="Cost Performance Index (EV / AC). Below 1 means over cost.")
+    boq_planned_value = fields.Monetary(
+        string='Planned Value (PV)', compute='_compute_boq_schedule', store=True, currency_field='boq_currency_id',
+        help="Budget scheduled to be done by today, linear between the task start and its deadline.")
+    boq_spi = fields.Float(
+        string='SPI', compute='_compute_boq_schedule', store=True, digits=(16, 2),
+        help="Schedule Performance Index (EV / PV). Below 1 means behind schedule.")
+
     _sql_constraints = [
         ('uniq_activity_code_project', 
          'UNIQUE(project_id, activity_code)', 
          'Activity Code must be unique per project.')
     ]
 
-    @api.constrains('activity_code', 'project_id')
-    def _check_activity_code_uniqueness(self):
-        """Additional Python constraint for better validation messages and bulk operations."""
+    # Uniqueness is enforced by uniq_activity_code_project alone: a Python
+    # check would cost one search per task on bulk imports.
+
+    def init(self):
+        # Codes are stored stripped and upper-cased, so prefix searches (=like 'CODE%')
+        # can use a plain btree with text_pattern_ops whatever the DB collation.
+        tools.create_index(self._cr, 'project_task_activity_code_prefix_idx',
+                           self._table, ['activity_code text_pattern_ops'])
+
+    # -------------------------------------------------------------------------
+    # BOQ COST ROLLUPS
+    # -------------------------------------------------------------------------
+    @api.depends('company_id')
+    def _compute_boq_currency_id(self):
+        for task in self:
+            task.boq_currency_id = task.company_id.currency_id or self.env.company.currency_id
+
+    @api.depends(
+        'boq_line_ids.is_boq_eligible', 'boq_line_ids.quantity',
+        'boq_line_ids.budget_amount', 'boq_line_ids.estimated_rate', 'boq_line_ids.ordered_quantity',
+        'boq_line_ids.consumed_quantity', 'boq_line_ids.consumed_amount',
+    )
+    def _compute_boq_costs(self):
+        totals = {task.id: [0.0, 0.0, 0.0, 0.0] for task in self}
+        task_ids = [task_id for task_id in self.ids if task_id]
+        if task_ids:
+            # One query for the whole batch, on the product lines of active
+            # Approved/Locked BOQs: drafts and archived revisions are not budgets
+            lines = self.env['construction.boq.line'].search_fetch(
+                [('task_id', 'in', task_ids), ('is_boq_eligible', '=', True)],
+                ['task_id', 'quantity', 'budget_amount', 'estimated_rate', 'ordered_quantity',
+                 'consumed_quantity', 'consumed_amount'],
+            )
+            for line in lines:
+                progress = min(line.consumed_quantity / line.quantity, 1.0) if line.quantity > 0 else 0.0
+                total = totals[line.task_id.id]
+                total[0] += line.budget_amount
+                total[1] += line.ordered_quantity * line.estimated_rate
+                total[2] += line.consumed_amount
+                total[3] += line.budget_amount * progress
+
         for task in self:
-            if task.activity_code:
-                # Only check if activity_code is not empty
-                existing = self.search([
-                    ('project_id', '=', task.project_id.id),
-                    ('activity_code', '=', task.activity_code),
-                    ('id', '!=', task.id)
-                ], limit=1)
-                if existing:
-                    raise ValidationError(
-                        f"Activity Code '{task.activity_code}' already exists for this project."
-                    )
+            budget, committed, actual, earned = totals[task.id]
+            task.boq_budget_amount = budget
+            task.boq_committed_amount = committed
+            task.boq_actual_cost = actual
+            task.boq_earned_value = earned
+            task.boq_cpi = earned / actual if actual else 0.0
+
+    @api.depends(lambda self: ['boq_budget_amount', 'boq_earned_value', 'date_deadline'] + _boq_planned_dates_depends(self))
+    def _compute_boq_schedule(self):
+        now = fields.Datetime.now()
+        for task in self:
+            start = task['planned_date_begin'] if 'planned_date_begin' in task._fields else False
+            start = start or task.create_date or now
+            end = task.date_deadline
+            if not task.boq_budget_amount or not end:
+                planned = 0.0
+            elif end <= start or now >= end:
+                planned = task.boq_budget_amount
+            elif now <= start:
+                planned = 0.0
+            else:
+                planned = task.boq_budget_amount * (now - start).total_seconds() / (end - start).total_seconds()
+            task.boq_planned_value = planned
+            task.boq_spi = task.boq_earned_value / planned if planned else 0.0
 
     @api.model
+    def _cron_refresh_boq_planned_value(self, batch_size=1000):
+        """Planned value moves with time: refresh it daily for tasks still in their planned window."""
+        # Past their deadline, tasks only need one last refresh to reach the full budget
+        tasks = self.search([
+            ('boq_budget_amount', '!=', 0.0),
+            ('date_deadline', '>=', fields.Datetime.now() - timedelta(days=1)),
+        ])
+        schedule_fields = [self._fields['boq_planned_value'], self._fields['boq_spi']]
+        for start in range(0, len(tasks), batch_size):
+            batch = tasks[start:start + batch_size]
+            for field in schedule_fields:
+                self.env.add_to_compute(field, batch)
+            batch.flush_recordset(['boq_planned_value', 'boq_spi'])
+            batch.invalidate_recordset()
+
+    @api.model_create_multi
     def create(self, vals_list):
         """Optimize create for bulk operations."""
         # If activity_code is provided, ensure proper formatting
-        if isinstance(vals_list, dict):
-            vals_list = [vals_list]
-        
         for vals in vals_list:
             if 'activity_code' in vals and vals.get('activity_code'):
                 vals['activity_code'] = vals['activity_code'].strip().upper()
@@ -64,19 +161,24 @@ class ProjectTask(models.Model):
         return super().copy(default)
 
     @api.model
-    def _name_search(self, name='', args=None, operator='ilike', limit=100, name_get_uid=None):
-        """Optimize search for activity_code."""
-        if args is None:
-            args = []
-        
-        # If searching by code prefix (common pattern), optimize the query
-        if operator in ('=', 'ilike', 'like') and name:
-            # Try to match by activity_code first as it's likely more specific
-            tasks = self.search(
-                args + [('activity_code', operator, name)], 
-                limit=limit
-            )
-            if tasks:
-                return tasks.ids
-        
-        return super()._name_search(name, args, operator, limit, name_get_uid)
\ No newline at end of file
+    def load(self, fields, data):
+        """Link BOQ lines to the imported tasks by activity code."""
+        res = super().load(fields, data)
+        if res.get('ids'):
+            self.env['construction.boq.line']._link_tasks_by_activity_code(self.browse(res['ids']).project_id.ids)
+        return res
+
+    @api.model
+    def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
+        """Search tasks by activity code prefix first (index-backed), then by name."""
+        if name and operator in ('=', 'ilike', 'like'):
+            code = name.strip().upper()
+            if operator == '=':
+                code_domain = [('activity_code', '=', code)]
+            else:
+                code_domain = [('activity_code', '=like', escape_psql(code) + '%')]
+            query = self._search(expression.AND([domain or [], code_domain]), limit=limit, order=order)
+            if query:
+                return query
+
+        return super()._name_search(name, domain, operator, limit, order)
@@ -3,6 +3,8 @@ from odoo import models, fields, api, _, Command
 from odoo.exceptions import ValidationError
 from collections import defaultdict
 
+from .boq_metric import profiled
+
 class PurchaseOrder(models.Model):
     _inherit = 'purchase.order'
 
@@ -29,14 +31,14 @@ class PurchaseOrder(models.Model):
     )
 
     # Task 2.2: Filter Products by BOQ Availability
-    @api.depends('boq_id.boq_line_ids.product_id', 'boq_id.boq_line_ids.is_complete')
+    @api.depends('boq_id')
     def _compute_boq_product_ids(self):
         for rec in self:
             if rec.boq_id:
-                # Filter out BOQ lines that are sections OR are already complete
-                rec.boq_product_ids = rec.boq_id.boq_line_ids.filtered(
-                    lambda l: not l.display_type and not l.is_complete
-                ).product_id
+                # Products of BOQ lines that are not sections and not yet complete,
+                # served from the cached per-BOQ line index
+                open_product_ids = rec.boq_id._origin._get_line_index()[1]
+                rec.boq_product_ids = [Command.set(list(open_product_ids))]
             else:
                 rec.boq_product_ids = False
 
@@ -74,16 +76,12 @@ class PurchaseOrder(models.Model):
     # -------------------------------------------------------------------------
     def button_confirm(self):
         """
-        Task 3.1: Trigger Versioning on PO Confirmation.
-        Automatically version the BOQ when a Purchase Order is confirmed 
-        to snapshot the state at that moment.
+        Task 3.1: Record BOQ commitments on PO Confirmation.
+        Instead of a full copy-on-write revision per order, a lightweight
+        commitment checkpoint (ordered totals per BOQ line + the POs) is
+        recorded, at most one per BOQ for the whole confirmation batch.
+        Full revisions remain reserved for real BOQ content changes.
         """
-        for order in self:
-            if order.purchase_type == 'boq' and order.boq_id:
-                # Create a revision snapshot of the BOQ *before* the PO is confirmed.
-                # This ensures we have a history of the BOQ state prior to this commitment.
-                order.boq_id.create_revision_snapshot()
-
         # Task 3.2: Auto-Update BOQ Status
         # Calling super() changes the PO line states to 'purchase'.
         # This automatically triggers the compute dependency on construction.boq.line:
@@ -91,6 +89,9 @@ class PurchaseOrder(models.Model):
         #   -> remaining_quantity
         #   -> is_complete
         res = super(PurchaseOrder, self).button_confirm()
+
+        confirmed_orders = self.filtered(lambda o: o.state in ('purchase', 'done'))
+        self.env['construction.boq.commitment']._record_checkpoints(confirmed_orders)
         return res
 
 
@@ -103,7 +104,7 @@ class PurchaseOrderLine(models.Model):
         string='BOQ Item',
         index=True,
         # Domain filters items belonging to the selected BOQ in the Header
-        domain="[('boq_id', '=', parent.boq_id), ('boq_id.state', 'in', ('approved', 'locked')), ('display_type', '=', False)]"
+        domain="[('boq_id', '=', parent.boq_id), ('is_boq_eligible', '=', True)]"
     )
 
     # -------------------------------------------------------------------------
@@ -142,12 +143,15 @@ class PurchaseOrderLine(models.Model):
         if self.boq_line_id and self.boq_line_id.product_id == self.product_id:
             return
 
-        # Search for the BOQ line in the header's BOQ that matches this product
-        matching_boq_line = self.env['construction.boq.line'].search([
-            ('boq_id', '=', self.order_id.boq_id.id),
-            ('product_id', '=', self.product_id.id),
-            ('display_type', '=', False)
-        ], limit=1)
+        # Look up the BOQ line in the cached index of the header's BOQ,
+        # preferring a line that still has quantity left to order
+        lines_by_product = self.order_id.boq_id._origin._get_line_index()[0]
+        entries = lines_by_product.get(self.product_id._origin.id, ())
+        matching_line_id = next(
+            (line_id for line_id, is_complete in entries if not is_complete),
+            entries[0][0] if entries else False
+        )
+        matching_boq_line = self.env['construction.boq.line'].browse(matching_line_id)
 
         if matching_boq_line:
             self.boq_line_id = matching_boq_line.id
@@ -187,6 +191,7 @@ class PurchaseOrderLine(models.Model):
 
     # Task 2.1: Enhance PO Line Constraints
     @api.constrains('product_qty', 'boq_line_id', 'order_id')
+    @profiled('purchase.order.line._check_boq_limit')
     def _check_boq_limit(self):
         """
         Phase 2 Gatekeeper: Enforce strict purchasing limits.
@@ -216,29 +221,23 @@ class PurchaseOrderLine(models.Model):
         if not lines_to_check:
             return
 
-        # 3. Group by BOQ Line to perform efficient bulk validation
-        # This handles cases where a user might add multiple lines for the same BOQ item in one order.
-        boq_line_ids = lines_to_check.mapped('boq_line_id')
-        
-        for boq_line in boq_line_ids:
+        # 3. Lock the affected BOQ lines (deterministic id order) so concurrent
+        # Purchase Orders on the same items are serialized and cannot both pass.
+        boq_lines = lines_to_check.mapped('boq_line_id')
+        self.env['construction.boq.lock']._lock_lines(boq_lines.ids, 'purchase.order.line._check_boq_limit')
+        boq_lines.invalidate_recordset(['quantity', 'additional_quantity'])
+
+        # 4. One grouped aggregate for all affected BOQ lines.
+        # Sums ALL non-cancelled PO lines in the system (including self) converted
+        # into the BOQ line UoM.
+        ordered_map = boq_lines._get_ordered_quantities()
+
+        for boq_line in boq_lines:
             # A. Calculate the Hard Limit
             limit_qty = boq_line.quantity + boq_line.additional_quantity
-            
-            # B. Calculate Total Ordered Quantity (The "Consumed" part of the budget)
-            # We explicitly sum ALL non-cancelled PO lines in the system linked to this BOQ item.
-            # This includes the lines currently being saved (self), as constrains run after DB write.
-            domain = [
-                ('boq_line_id', '=', boq_line.id),
-                ('state', '!=', 'cancel')
-            ]
-            
-            # efficient read_group to sum 'product_qty'
-            result = self.env['purchase.order.line'].read_group(
-                domain, ['product_qty'], ['boq_line_id']
-            )
-            total_ordered = result[0]['product_qty'] if result else 0.0
-            
-            # C. The Gatekeeper Check
+            total_ordered = ordered_map.get(boq_line.id, 0.0)
+
+            # B. The Gatekeeper Check
             # Use 0.0001 epsilon for floating point safety
             if total_ordered > (limit_qty + 0.0001):
                 raise ValidationError(
@@ -247,11 +246,12 @@ class PurchaseOrderLine(models.Model):
                       'Budget Qty: %(budget)s\n'
                       'Additional Qty: %(additional)s\n'
                       'Total Limit: %(limit)s\n'
-                      'Total Ordered (incl. this PO): %(ordered)s') % {
+                      'Total Ordered (incl. this PO): %(ordered)s %(uom)s') % {
                         'name': boq_line.name,
                         'budget': boq_line.quantity,
                         'additional': boq_line.additional_quantity,
                         'limit': limit_qty,
-                        'ordered': total_ordered
+                        'ordered': total_ordered,
+                        'uom': boq_line.uom_id.name or '',
                     }
-                )
\ No newline at end of file
+                )
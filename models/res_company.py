@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    boq_ledger_posting_mode = fields.Selection([
+        ('sync', 'Synchronous'),
+        ('deferred', 'Deferred'),
+        ('deferred_strict', 'Deferred (Strict Budget Check)'),
+    ], string='BOQ Ledger Posting', default='sync', required=True,
+       help="Synchronous: bills write their BOQ consumption ledger rows while posting.\n"
+            "Deferred: ledger rows are queued and written by a background worker; budgets are checked by the worker.\n"
+            "Deferred (Strict Budget Check): budgets are still validated while posting (including queued entries), "
+            "only the ledger writes are deferred.")
+    boq_audit_mode = fields.Selection([
+        ('full', 'Full'),
+        ('summary', 'Summary'),
+    ], string='BOQ Audit Trail', default='full', required=True,
+       help="Full: every tracked BOQ field change is logged with its old and new value.\n"
+            "Summary: field tracking is skipped and each write logs one short summary note per BOQ, "
+            "which keeps mass approvals, imports and revisions fast.")
@@ -1,16 +1,56 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+import logging
+
+from odoo import models, modules, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Orders up to this many lines are generated synchronously by action_generate_boq
+BOQ_SYNC_LINE_LIMIT = 2000
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
     boq_ids = fields.One2many('construction.boq', 'sale_order_id', string='BOQs')
-    boq_count = fields.Integer(compute='_compute_boq_count', string='BOQ Count')
+    boq_count = fields.Integer(compute='_compute_boq_rollups', string='BOQ Count', store=True)
+    boq_currency_id = fields.Many2one('res.currency', related='company_id.currency_id', string='BOQ Currency')
+    boq_budget_total = fields.Monetary(
+        string='BOQ Budget', compute='_compute_boq_rollups', store=True, currency_field='boq_currency_id',
+        help="Total budget of the active BOQs of this order, in company currency.")
+    boq_budget_margin = fields.Monetary(
+        string='Budget Margin', compute='_compute_boq_rollups', store=True, currency_field='boq_currency_id',
+        help="Untaxed sold amount (in company currency) minus the BOQ budget.")
+    boq_budget_margin_percent = fields.Float(
+        string='Budget Margin (%)', compute='_compute_boq_rollups', store=True, aggregator='avg')
+    boq_generation_queued = fields.Boolean(string='BOQ Generation Queued', copy=False, index=True, readonly=True)
+    boq_generation_error = fields.Text(string='BOQ Generation Error', copy=False, readonly=True)
+
+    @api.depends('boq_ids.active', 'boq_ids.total_budget', 'amount_untaxed', 'currency_id', 'date_order')
+    def _compute_boq_rollups(self):
+        # One grouped query for the whole recordset instead of loading boq_ids per order
+        order_ids = [order_id for order_id in self.ids if order_id]
+        groups = self.env['construction.boq']._read_group(
+            [('sale_order_id', 'in', order_ids)],
+            ['sale_order_id'], ['__count', 'total_budget:sum'],
+        ) if order_ids else []
+        rollups = {order.id: (count, budget) for order, count, budget in groups}
 
-    @api.depends('boq_ids')
-    def _compute_boq_count(self):
         for order in self:
-            order.boq_count = len(order.boq_ids)
+            count, budget = rollups.get(order.id, (0, 0.0))
+            order.boq_count = count
+            order.boq_budget_total = budget
+            if not count:
+                order.boq_budget_margin = 0.0
+                order.boq_budget_margin_percent = 0.0
+                continue
+            company_currency = order.company_id.currency_id
+            sold = order.currency_id._convert(
+                order.amount_untaxed, company_currency, order.company_id,
+                order.date_order or fields.Date.context_today(order),
+            ) if order.currency_id and order.currency_id != company_currency else order.amount_untaxed
+            order.boq_budget_margin = sold - budget
+            order.boq_budget_margin_percent = (sold - budget) / sold * 100.0 if sold else 0.0
 
     def action_create_boq(self):
         """
@@ -40,6 +80,62 @@ class SaleOrder(models.Model):
             }
         }
 
+    def action_generate_boq(self):
+        """
+        Generate draft BOQs for the selected confirmed orders on the server,
+        without sending the lines through the form. Small selections are
+        generated right away; larger ones are queued for the background job.
+        """
+        orders = self.filtered(lambda o: o.state in ('sale', 'done'))
+        if not orders:
+            raise UserError(_('BOQs can only be generated from confirmed Sales Orders.'))
+
+        line_count = self.env['sale.order.line'].search_count([('order_id', 'in', orders.ids)])
+        if len(orders) == 1 and line_count <= BOQ_SYNC_LINE_LIMIT:
+            boq = self.env['construction.boq']._generate_from_sale_order(orders)
+            return {
+                'type': 'ir.actions.act_window',
+                'res_model': 'construction.boq',
+                'view_mode': 'form',
+                'res_id': boq.id,
+                'target': 'current',
+            }
+
+        orders.write({'boq_generation_queued': True, 'boq_generation_error': False})
+        self.env.ref('sitemate.ir_cron_sale_order_generate_boq')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('BOQ Generation'),
+                'message': _('%s order(s) queued. Their BOQs will be generated in the background.') % len(orders),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+
+    @api.model
+    def _cron_generate_queued_boqs(self, batch_size=20):
+        """Background job: generate the BOQs of queued orders, one order per savepoint."""
+        # No intermediate commits while the test suite runs
+        auto_commit = not modules.module.current_test
+        orders = self.search([('boq_generation_queued', '=', True)], limit=batch_size, order='id')
+        for order in orders:
+            try:
+                with self.env.cr.savepoint():
+                    self.env['construction.boq']._generate_from_sale_order(order)
+                order.write({'boq_generation_queued': False, 'boq_generation_error': False})
+            except (UserError, ValidationError) as e:
+                _logger.info("BOQ generation failed for %s: %s", order.name, e)
+                order.write({'boq_generation_queued': False, 'boq_generation_error': str(e)})
+                order.message_post(body=_('BOQ generation failed: %s') % e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        remaining = self.search_count([('boq_generation_queued', '=', True)])
+        if auto_commit:
+            self.env['ir.cron']._notify_progress(done=len(orders), remaining=remaining)
+
     def action_view_boq(self):
         """
         Smart button action to view related BOQs.
@@ -1,6 +1,54 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+from odoo import models, modules, fields, api, _
 from odoo.exceptions import ValidationError
+from collections import defaultdict
+
+from .boq_metric import profiled
+
+
+class StockPicking(models.Model):
+    _inherit = 'stock.picking'
+
+    project_id = fields.Many2one(
+        'project.project',
+        string='Project',
+        index=True,
+        help="Construction project this transfer belongs to. Used to link moves to BOQ lines automatically."
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        pickings = super(StockPicking, self).create(vals_list)
+        pickings.move_ids._boq_auto_link()
+        return pickings
+
+    def write(self, vals):
+        res = super(StockPicking, self).write(vals)
+        if 'project_id' in vals or 'move_ids' in vals or 'move_ids_without_package' in vals:
+            self.move_ids._boq_auto_link()
+        return res
+
+    def action_confirm(self):
+        # Link before confirming so reservation and valuation already see the BOQ line
+        self.move_ids._boq_auto_link()
+        return super(StockPicking, self).action_confirm()
+
+    def action_boq_auto_link(self):
+        """
+        Bulk action: link every unlinked move of the selected transfers
+        to the matching active BOQ line.
+        """
+        linked = self.move_ids._boq_auto_link()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('BOQ Auto-Link'),
+                'message': _('%s stock move(s) linked to BOQ lines.') % len(linked),
+                'type': 'success' if linked else 'warning',
+                'sticky': False,
+            }
+        }
 
 
 class StockMove(models.Model):
@@ -11,11 +59,82 @@ class StockMove(models.Model):
         'construction.boq.line',
         string='BOQ Line',
         index=True,
-        # [FIX] Added display_type = False to domain
-        domain="[('boq_id.state', 'in', ('approved', 'locked')), ('display_type', '=', False)]",
+        # Stored eligibility flag: Approved/Locked active BOQ and not a Section/Note
+        domain="[('is_boq_eligible', '=', True)]",
         help="Link this move to a BOQ line for budget tracking."
     )
 
+    # ---------------------------------------------------------
+    # Automatic BOQ Line Matching
+    # ---------------------------------------------------------
+
+    def _boq_auto_link(self):
+        """
+        Link moves without a BOQ line to the active BOQ line of their
+        picking's project for the same product.
+        The (project, product) index is built once for the whole batch and
+        moves are written grouped by target line, so the cost does not
+        depend on the number of moves.
+        Returns the moves that were linked.
+        """
+        moves = self.filtered(
+            lambda m: (
+                not m.boq_line_id and
+                m.state not in ('done', 'cancel') and
+                m.product_id and
+                m.picking_id.project_id
+            )
+        )
+        if not moves:
+            return self.browse()
+
+        index = self.env['construction.boq.line']._get_project_product_index(
+            moves.picking_id.project_id.ids,
+            moves.product_id.ids,
+        )
+        if not index:
+            return self.browse()
+
+        move_ids_by_line = defaultdict(list)
+        for move in moves:
+            line_id = index.get((move.picking_id.project_id.id, move.product_id.id))
+            if line_id:
+                move_ids_by_line[line_id].append(move.id)
+
+        linked_ids = []
+        for line_id, move_ids in move_ids_by_line.items():
+            self.browse(move_ids).write({'boq_line_id': line_id})
+            linked_ids.extend(move_ids)
+        return self.browse(linked_ids)
+
+    @api.model
+    def _cron_boq_auto_link(self, batch_size=5000, max_batches=50):
+        """
+        Re-link all open, unlinked moves of transfers that have a project.
+        Processed in id-ordered batches, one transaction per batch, to keep
+        memory and lock time bounded on large databases.
+        Returns the number of moves linked.
+        """
+        # No intermediate commits while the test suite runs
+        auto_commit = not modules.module.current_test
+        domain = [
+            ('boq_line_id', '=', False),
+            ('state', 'not in', ('done', 'cancel')),
+            ('picking_id.project_id', '!=', False),
+        ]
+        linked_count = 0
+        last_id = 0
+        for _batch in range(max_batches):
+            moves = self.search(domain + [('id', '>', last_id)], order='id', limit=batch_size)
+            if not moves:
+                break
+            linked_count += len(moves._boq_auto_link())
+            last_id = moves[-1].id
+            if auto_commit:
+                self.env['ir.cron']._notify_progress(done=len(moves), remaining=self.search_count(domain + [('id', '>', last_id)]))
+                self.env.cr.commit()
+        return linked_count
+
     # ---------------------------------------------------------
     # Constraints & Validations
     # ---------------------------------------------------------
@@ -101,6 +220,7 @@ class StockMove(models.Model):
     # Subtask 1.1: Consumption Recording & Validation
     # ---------------------------------------------------------
 
+    @profiled('stock.move._action_done')
     def _action_done(self, cancel_backorder=False):
         """
         Override _action_done to:
@@ -119,9 +239,14 @@ class StockMove(models.Model):
         )
         
         if moves_to_validate:
-            # Bulk read remaining quantities to avoid N+1 queries
+            # Lock the BOQ lines (shared locking service) before reading their totals
             boq_line_ids = moves_to_validate.mapped('boq_line_id.id')
+            self.env['construction.boq.lock']._lock_lines(boq_line_ids, 'stock.move._action_done')
+
+            # Bulk read remaining quantities to avoid N+1 queries
             boq_lines = self.env['construction.boq.line'].browse(boq_line_ids)
+            boq_lines.invalidate_recordset(['remaining_quantity'])
+            boq_lines._refresh_deferred_rollups()
             
             # Create a dictionary for quick lookup
             remaining_qty_dict = {
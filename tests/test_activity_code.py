@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from psycopg2 import IntegrityError
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
+
+class TestActivityCode(TransactionCase):
+    """
+    Verify activity code normalisation, its SQL uniqueness per project and
+    the code prefix search on tasks.
+    """
+
+    def setUp(self):
+        super(TestActivityCode, self).setUp()
+        self.project = self.env['project.project'].create({'name': 'Activity Code Project'})
+        self.Task = self.env['project.task']
+        self.tasks = self.Task.create([{
+            'name': name,
+            'project_id': self.project.id,
+            'activity_code': code,
+        } for name, code in [('Excavation', ' civ-100 '), ('Backfill', 'CIV-101'), ('Roofing', 'ARC-200')]])
+
+    def test_codes_normalised(self):
+        self.assertEqual(self.tasks.mapped('activity_code'), ['CIV-100', 'CIV-101', 'ARC-200'])
+        self.tasks[2].activity_code = ' arc-201'
+        self.assertEqual(self.tasks[2].activity_code, 'ARC-201')
+
+    def test_unique_per_project(self):
+        other_project = self.env['project.project'].create({'name': 'Other Project'})
+        self.Task.create({'name': 'Excavation', 'project_id': other_project.id, 'activity_code': 'CIV-100'})
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.env.cr.savepoint():
+            self.Task.create({'name': 'Duplicate', 'project_id': self.project.id, 'activity_code': 'civ-100'})
+
+    def test_copy_drops_code(self):
+        self.assertFalse(self.tasks[0].copy().activity_code)
+
+    def test_name_search_by_code_prefix(self):
+        domain = [('project_id', '=', self.project.id)]
+        found = self.Task.name_search('civ-10', domain)
+        self.assertEqual({task_id for task_id, _name in found}, set(self.tasks[:2].ids))
+        found = self.Task.name_search('CIV-101', domain, operator='=')
+        self.assertEqual([task_id for task_id, _name in found], self.tasks[1].ids)
+        # No code match: falls back to the name search
+        found = self.Task.name_search('Roof', domain)
+        self.assertEqual([task_id for task_id, _name in found], self.tasks[2].ids)
+        # '%' and '_' in the input are literals, not wildcards
+        self.assertFalse(self.Task.name_search('CIV_1', domain))
+
+    def test_prefix_index_exists(self):
+        self.env.cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'project_task_activity_code_prefix_idx'")
+        self.assertTrue(self.env.cr.fetchone())
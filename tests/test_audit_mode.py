@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestAuditMode(TransactionCase):
+    """
+    Verify the chatter volume of a multi-record BOQ write in each audit mode:
+    summary mode logs one note per BOQ and no tracking values.
+    """
+
+    def setUp(self):
+        super(TestAuditMode, self).setUp()
+        generator = BOQDataGenerator(self.env, seed=2)
+        products = generator.create_products(1)
+        projects = generator.create_projects(3)
+        self.boqs = generator.create_boqs(projects, products, lines=1, section_every=0, approve=False)
+
+    def _count_chatter(self):
+        messages = self.env['mail.message'].search_count([
+            ('model', '=', 'construction.boq'), ('res_id', 'in', self.boqs.ids),
+        ])
+        tracking_values = self.env['mail.tracking.value'].search_count([
+            ('mail_message_id.model', '=', 'construction.boq'), ('mail_message_id.res_id', 'in', self.boqs.ids),
+        ])
+        return messages, tracking_values
+
+    def _write_and_count(self, vals):
+        """Write ``vals`` on all the BOQs at once; returns the new (messages, tracking values)."""
+        messages_before, tracking_before = self._count_chatter()
+        self.boqs.write(vals)
+        # Tracking values are written by the precommit hooks
+        self.env.cr.flush()
+        messages_after, tracking_after = self._count_chatter()
+        return messages_after - messages_before, tracking_after - tracking_before
+
+    def test_summary_mode_one_note_per_boq(self):
+        self.env.company.boq_audit_mode = 'summary'
+        new_messages, new_tracking_values = self._write_and_count({'state': 'submitted'})
+        self.assertEqual(new_messages, len(self.boqs))
+        self.assertEqual(new_tracking_values, 0)
+
+    def test_full_mode_tracks_fields(self):
+        self.env.company.boq_audit_mode = 'full'
+        _new_messages, new_tracking_values = self._write_and_count({'state': 'submitted'})
+        self.assertEqual(new_tracking_values, len(self.boqs))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from argparse import Namespace
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.cli import backfill
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestBackfill(TransactionCase):
+    """
+    Verify the set-based rollup rebuild used by the backfill command, and
+    the resumable id ranges of the command itself (run in-process).
+    """
+
+    def setUp(self):
+        super(TestBackfill, self).setUp()
+        generator = BOQDataGenerator(self.env, seed=13)
+        generator.LINE_QUANTITY = 10.0
+        products = generator.create_products(2)
+        self.boq = generator.create_boqs(generator.create_projects(1), products, lines=6, section_every=0)
+        self.lines = generator.product_lines(self.boq)
+        generator.create_purchase_orders(self.boq, orders=1, order_lines=2, quantity=4.0)
+        generator.create_ledger_entries(self.lines[:1], 2, quantity=1.0)
+        self.env.flush_all()
+        self.Line = self.env['construction.boq.line']
+
+    def _corrupt_rollups(self):
+        self.env.cr.execute("""
+            UPDATE construction_boq_line
+               SET ordered_quantity = 0, remaining_quantity = 0, is_complete = TRUE,
+                   consumed_quantity = 0, consumed_amount = 0
+             WHERE id IN %s
+        """, (tuple(self.lines.ids),))
+        self.lines.invalidate_recordset()
+
+    def _assert_rollups(self):
+        self.lines.invalidate_recordset()
+        first, second = self.lines[:2]
+        self.assertAlmostEqual(first.ordered_quantity, 4.0)
+        self.assertAlmostEqual(first.remaining_quantity, 6.0)
+        self.assertAlmostEqual(first.consumed_quantity, 2.0)
+        self.assertAlmostEqual(first.consumed_amount, 2.0 * first.estimated_rate)
+        self.assertFalse(first.is_complete)
+        self.assertAlmostEqual(second.ordered_quantity, 4.0)
+        self.assertAlmostEqual(self.lines[-1].remaining_quantity, 10.0)
+
+    def test_rebuild_restores_rollups(self):
+        self._corrupt_rollups()
+        rebuilt = self.Line._rebuild_line_rollups(self.lines.ids)
+        self.assertEqual(rebuilt, self.lines)
+        self._assert_rollups()
+
+    def test_ranges_resume(self):
+        args = Namespace(run_name='test', chunk_size=2, restart=False)
+        command = backfill.SiteMateBackfill()
+        pending = command._prepare_ranges(self.registry, args)
+        self.assertTrue(pending)
+        self.assertLessEqual(pending[0][0], min(self.lines.ids))
+
+        self._corrupt_rollups()
+        with patch.object(backfill, '_worker_registry', self.registry):
+            processed = [backfill._process_range('test', start, end, [])[1] for start, end in pending]
+        self.assertGreaterEqual(sum(processed), len(self.lines))
+        self._assert_rollups()
+
+        # Finished ranges are skipped on the next run, unless restarted
+        self.assertFalse(command._prepare_ranges(self.registry, args))
+        args.restart = True
+        self.assertEqual(command._prepare_ranges(self.registry, args), pending)
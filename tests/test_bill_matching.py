@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestBillMatching(TransactionCase):
+    """
+    Verify the BOQ line matching of vendor bill lines entered without a
+    Purchase Order: by product on the analytic account, by activity code in
+    the label, and never on ambiguous or foreign matches.
+    """
+
+    def setUp(self):
+        super(TestBillMatching, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=8)
+        self.products = self.generator.create_products(3)
+        self.project = self.generator.create_projects(1)
+        # Four lines on three products: the first product is on two lines
+        self.boq = self.generator.create_boqs(self.project, self.products, lines=4, section_every=0, approve=False)
+        self.lines = self.generator.product_lines(self.boq)
+        for index, line in enumerate(self.lines):
+            line.activity_code = 'CIV-%02d' % (index + 1)
+        self.boq.action_submit()
+        self.boq.action_approve()
+
+        self.vendor = self.generator.get_vendor()
+        self.other_product = self.generator.create_products(1)
+
+    def _create_bill(self, lines_vals, analytic_account=None):
+        analytic_account = analytic_account or self.boq.analytic_account_id
+        return self.env['account.move'].create({
+            'move_type': 'in_invoice',
+            'partner_id': self.vendor.id,
+            'invoice_date': fields.Date.today(),
+            'invoice_line_ids': [(0, 0, {
+                'product_id': product.id,
+                'name': label,
+                'quantity': 1.0,
+                'price_unit': 10.0,
+                'analytic_distribution': {str(analytic_account.id): 100.0},
+                'tax_ids': [(5, 0, 0)],
+            }) for product, label in lines_vals],
+        })
+
+    def test_match_by_product_and_code(self):
+        bill = self._create_bill([
+            (self.products[1], 'Rebar delivery'),
+            (self.other_product, 'Formwork, ref civ-03'),
+        ])
+        bill.invoice_line_ids.boq_line_id = False
+        bill.action_boq_match_lines()
+        by_product, by_code = bill.invoice_line_ids
+        self.assertEqual(by_product.boq_line_id, self.lines[1])
+        self.assertEqual(by_code.boq_line_id, self.lines[2])
+
+    def test_no_ambiguous_or_foreign_match(self):
+        other_project = self.generator.create_projects(1)
+        bill = self._create_bill([(self.products[0], 'Cement')])
+        foreign_bill = self._create_bill([(self.products[1], 'Rebar')], analytic_account=other_project.account_id)
+        bills = bill | foreign_bill
+        bills.invoice_line_ids.boq_line_id = False
+
+        matched = bills.invoice_line_ids._boq_auto_match()
+        self.assertFalse(matched)
+        self.assertFalse(bills.invoice_line_ids.boq_line_id)
+
+    def test_batch_of_bills(self):
+        bills = self._create_bill([(self.products[1], 'Rebar')]) | self._create_bill([(self.products[2], 'Sand')])
+        bills.invoice_line_ids.boq_line_id = False
+        linked = self._create_bill([(self.products[1], 'Rebar')])
+        linked.invoice_line_ids.boq_line_id = self.lines[3]
+
+        (bills | linked).action_boq_match_lines()
+        self.assertEqual(bills.invoice_line_ids.boq_line_id, self.lines[1] | self.lines[2])
+        # Already linked lines keep their BOQ item
+        self.assertEqual(linked.invoice_line_ids.boq_line_id, self.lines[3])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestBOQEligibility(TransactionCase):
+    """
+    Verify that the stored header status and eligibility of BOQ lines follow
+    the BOQ, and that the relational lookups filter on them.
+    """
+
+    def setUp(self):
+        super(TestBOQEligibility, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=9)
+        self.products = self.generator.create_products(1)
+        self.project = self.generator.create_projects(1)
+        self.boq = self.generator.create_boqs(self.project, self.products, lines=2, section_every=2, approve=False)
+        self.section = self.boq.boq_line_ids.filtered('display_type')
+        self.lines = self.generator.product_lines(self.boq)
+        self.Line = self.env['construction.boq.line']
+
+    def _eligible_lines(self):
+        return self.Line.search([('project_id', '=', self.project.id), ('is_boq_eligible', '=', True)])
+
+    def test_eligibility_follows_header(self):
+        self.assertEqual(set(self.lines.mapped('boq_state')), {'draft'})
+        self.assertFalse(self._eligible_lines())
+
+        self.boq.action_submit()
+        self.boq.action_approve()
+        self.assertEqual(set(self.lines.mapped('boq_state')), {'approved'})
+        # Sections are never eligible
+        self.assertFalse(self.section.is_boq_eligible)
+        self.assertEqual(self._eligible_lines(), self.lines)
+
+        self.boq.action_lock()
+        self.assertEqual(self._eligible_lines(), self.lines)
+
+        self.boq.action_close()
+        self.assertFalse(self._eligible_lines())
+
+    def test_archived_boq_not_eligible(self):
+        self.boq.action_submit()
+        self.boq.action_approve()
+        self.boq.active = False
+        self.assertFalse(self.lines[0].boq_active)
+        self.assertFalse(self._eligible_lines())
+
+    def test_revision_snapshot_not_eligible(self):
+        self.boq.action_submit()
+        self.boq.action_approve()
+        self.boq.action_revise()
+        snapshot = self.boq.previous_boq_id
+        self.assertFalse(snapshot.active)
+        self.assertFalse(snapshot.boq_line_ids.filtered('is_boq_eligible'))
+        self.assertEqual(self._eligible_lines(), self.Line)
+
+    def test_unique_active_version_in_batch(self):
+        with self.assertRaises(ValidationError):
+            self.env['construction.boq'].create([{
+                'name': 'Duplicate %s' % index,
+                'project_id': self.project.id,
+                'version': 5,
+            } for index in range(2)])
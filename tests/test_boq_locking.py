@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2 import errors
+
+from odoo import api, SUPERUSER_ID
+from odoo.exceptions import ValidationError
+from odoo.modules.registry import Registry
+from odoo.tests.common import BaseCase, get_db_name
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+
+@contextmanager
+def environment():
+    """Environment on a real cursor of its own, committed on exit."""
+    registry = Registry(get_db_name())
+    with registry.cursor() as cr:
+        yield api.Environment(cr, SUPERUSER_ID, {})
+
+
+class TestBOQLocking(BaseCase):
+    """
+    Two transactions saving purchase order lines against the same BOQ line
+    at the same time: the second waits for the first, no deadlock, and only
+    one of them fits in the budget. Uses committed data on real cursors, so
+    the records are removed again in tearDown.
+    """
+
+    def setUp(self):
+        super(TestBOQLocking, self).setUp()
+        with environment() as env:
+            generator = BOQDataGenerator(env, seed=3)
+            generator.LINE_QUANTITY = 10.0
+            products = generator.create_products(1)
+            projects = generator.create_projects(1)
+            boq = generator.create_boqs(projects, products, lines=1, section_every=0)
+            self.boq_id = boq.id
+            self.project_id = projects.id
+            self.product_id = products.id
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        with environment() as env:
+            orders = env['purchase.order'].search([('project_id', '=', self.project_id)])
+            vendors = orders.partner_id
+            orders.button_cancel()
+            orders.unlink()
+            vendors.unlink()
+            env['construction.boq'].with_context(active_test=False).search([('project_id', '=', self.project_id)]).unlink()
+            project = env['project.project'].browse(self.project_id)
+            analytic_account = project.account_id
+            project.unlink()
+            analytic_account.unlink()
+            env['product.product'].browse(self.product_id).unlink()
+
+    def _save_order(self, env, quantity):
+        boq = env['construction.boq'].browse(self.boq_id)
+        BOQDataGenerator(env).create_purchase_orders(boq, orders=1, order_lines=1, quantity=quantity, confirm=False)
+
+    def _save_order_with_retries(self, quantity, outcome):
+        """Save an order in its own transaction, retrying concurrency errors like the HTTP layer does."""
+        for _attempt in range(3):
+            try:
+                with environment() as env:
+                    self._save_order(env, quantity)
+                outcome.append('ok')
+                return
+            except errors.SerializationFailure:
+                outcome.append('retry')
+            except errors.DeadlockDetected:
+                outcome.append('deadlock')
+                return
+            except ValidationError:
+                outcome.append('rejected')
+                return
+
+    def test_concurrent_orders_on_same_line(self):
+        outcome = []
+        with environment() as env:
+            # Holds the lock on the BOQ line until this block commits
+            self._save_order(env, 6.0)
+            thread = threading.Thread(target=self._save_order_with_retries, args=(6.0, outcome))
+            thread.start()
+            time.sleep(1.0)
+            self.assertFalse(outcome, "The second save must wait for the first transaction")
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive(), "The second save is still blocked")
+
+        self.assertNotIn('deadlock', outcome)
+        self.assertEqual(outcome[-1], 'rejected', "6 + 6 exceeds the budget of 10: the second save must fail")
+        with environment() as env:
+            ordered = env['purchase.order.line'].search([('order_id.project_id', '=', self.project_id)])
+            self.assertEqual(sum(ordered.mapped('product_qty')), 6.0)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestCommitmentCheckpoint(TransactionCase):
+    """
+    Verify that confirming Purchase Orders records one commitment checkpoint
+    per BOQ and batch instead of a full BOQ revision per order.
+    """
+
+    def setUp(self):
+        super(TestCommitmentCheckpoint, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=7)
+        products = self.generator.create_products(2)
+        self.projects = self.generator.create_projects(2)
+        self.boqs = self.generator.create_boqs(self.projects, products, lines=2, section_every=0)
+        self.Checkpoint = self.env['construction.boq.commitment']
+        self.Boq = self.env['construction.boq'].with_context(active_test=False)
+
+    def test_one_checkpoint_per_boq_and_batch(self):
+        boq_count = self.Boq.search_count([('project_id', 'in', self.projects.ids)])
+        orders = self.generator.create_purchase_orders(self.boqs, orders=3, order_lines=2, quantity=5.0, confirm=False)
+        orders.button_confirm()
+
+        checkpoints = self.Checkpoint.search([('boq_id', 'in', self.boqs.ids)])
+        self.assertEqual(len(checkpoints), 2)
+        for boq in self.boqs:
+            checkpoint = checkpoints.filtered(lambda c: c.boq_id == boq)
+            self.assertEqual(checkpoint.purchase_order_ids, orders.filtered(lambda o: o.boq_id == boq))
+            self.assertEqual(checkpoint.line_count, 2)
+            self.assertEqual(checkpoint.boq_version, boq.version)
+            for line in self.generator.product_lines(boq):
+                self.assertAlmostEqual(checkpoint.ordered_totals[str(line.id)], 15.0)
+
+        # No revision copies for confirmations
+        self.assertEqual(self.Boq.search_count([('project_id', 'in', self.projects.ids)]), boq_count)
+
+    def test_normal_orders_record_nothing(self):
+        orders = self.generator.create_purchase_orders(self.boqs[0], orders=1, order_lines=1, confirm=False)
+        orders.write({'purchase_type': 'normal', 'boq_id': False})
+        orders.order_line.boq_line_id = False
+        orders.button_confirm()
+        self.assertFalse(self.Checkpoint.search([('boq_id', 'in', self.boqs.ids)]))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+
+class TestDeferredRecompute(TransactionCase):
+    """
+    Verify the deferred recompute mode of BOQ line rollups: stored values stay
+    put during the mass operation, budget checks still see the real values,
+    and the SQL rebuild gives the same result as the regular computes.
+    """
+
+    def setUp(self):
+        super(TestDeferredRecompute, self).setUp()
+
+        self.project = self.env['project.project'].create({'name': 'Test Project'})
+        self.task = self.env['project.task'].create({'name': 'Test Task', 'project_id': self.project.id})
+        self.boq = self.env['construction.boq'].create({
+            'project_id': self.project.id,
+            'name': 'Test BOQ',
+            'state': 'approved'
+        })
+        self.product = self.env['product.product'].create({'name': 'Test Product', 'standard_price': 100})
+        self.boq_line = self.env['construction.boq.line'].create({
+            'boq_id': self.boq.id,
+            'product_id': self.product.id,
+            'quantity': 10.0,
+            'estimated_rate': 100.0,
+            'uom_id': self.env.ref('uom.product_uom_unit').id,
+            'expense_account_id': self.env['account.account'].search([], limit=1).id,
+            'task_id': self.task.id,
+        })
+        self.deferred_env = self.env(context=dict(self.env.context, boq_defer_recompute=True))
+
+    def _consume(self, env, source_id, qty):
+        env['construction.boq.consumption'].create({
+            'boq_line_id': self.boq_line.id,
+            'source_model': 'test.model',
+            'source_id': source_id,
+            'quantity': qty,
+            'amount': qty * 100.0,
+        })
+
+    def _stored_consumed_amount(self):
+        self.deferred_env.flush_all()
+        self.env.cr.execute("SELECT consumed_amount FROM construction_boq_line WHERE id = %s", (self.boq_line.id,))
+        return self.env.cr.fetchone()[0]
+
+    def test_rollups_rebuilt_once(self):
+        self._consume(self.deferred_env, 1, 2.0)
+        self._consume(self.deferred_env, 2, 3.0)
+        self.assertEqual(self._stored_consumed_amount(), 0.0)
+
+        self.assertEqual(self.deferred_env['construction.boq.line']._flush_deferred_recompute(), 1)
+        line = self.deferred_env['construction.boq.line'].browse(self.boq_line.id)
+        self.assertEqual(line.consumed_quantity, 5.0)
+        self.assertEqual(line.consumed_amount, 500.0)
+        self.assertEqual(line.remaining_amount, 500.0)
+        self.assertEqual(self._stored_consumed_amount(), 500.0)
+
+        # Same values as the regular computes
+        self.boq_line.invalidate_recordset()
+        self.env.add_to_compute(self.boq_line._fields['consumed_amount'], self.boq_line)
+        self.boq_line.flush_recordset()
+        self.assertEqual(self.boq_line.consumed_amount, 500.0)
+
+    def test_budget_check_sees_deferred_consumption(self):
+        self._consume(self.deferred_env, 1, 3.0)
+        self._consume(self.deferred_env, 2, 3.0)
+        # Stored remaining amount is still the full budget, the ledger says 400 is left
+        with self.assertRaises(ValidationError):
+            self._consume(self.deferred_env, 3, 5.0)
+        self.assertEqual(self._stored_consumed_amount(), 0.0)
+
+    def test_rebuild_before_commit(self):
+        self._consume(self.deferred_env, 1, 2.0)
+        self._consume(self.deferred_env, 2, 3.0)
+        self.deferred_env.flush_all()
+        # Runs the precommit hooks like a commit would
+        self.env.cr.flush()
+        self.assertEqual(self._stored_consumed_amount(), 500.0)
+
+        self.env.cr.execute("SELECT boq_actual_cost FROM project_task WHERE id = %s", (self.task.id,))
+        self.assertEqual(self.env.cr.fetchone()[0], 500.0)
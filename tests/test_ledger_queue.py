@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+class TestLedgerQueue(TransactionCase):
+    """
+    Verify the deferred BOQ ledger queue worker: entries are written once,
+    and over-budget entries fail without blocking the rest of the batch.
+    """
+
+    def setUp(self):
+        super(TestLedgerQueue, self).setUp()
+
+        self.project = self.env['project.project'].create({'name': 'Test Project'})
+        self.boq = self.env['construction.boq'].create({
+            'project_id': self.project.id,
+            'name': 'Test BOQ',
+            'state': 'approved'
+        })
+        self.product = self.env['product.product'].create({'name': 'Test Product', 'standard_price': 100})
+        line_vals = {
+            'boq_id': self.boq.id,
+            'product_id': self.product.id,
+            'quantity': 10.0,
+            'estimated_rate': 100.0,
+            'uom_id': self.env.ref('uom.product_uom_unit').id,
+            'expense_account_id': self.env['account.account'].search([], limit=1).id
+        }
+        # Budget per line: 10 Qty, 1000 Amount
+        self.line_a, self.line_b = self.env['construction.boq.line'].create([line_vals, dict(line_vals)])
+        self.Queue = self.env['construction.boq.ledger.queue']
+
+    def _vals(self, line, source_id, qty):
+        return {
+            'boq_line_id': line.id,
+            'source_model': 'test.model',
+            'source_id': source_id,
+            'quantity': qty,
+            'amount': qty * 100.0,
+            'date': '2024-01-01',
+            'user_id': self.env.user.id,
+        }
+
+    def test_worker_writes_each_entry_once(self):
+        items = self.Queue._enqueue([self._vals(self.line_a, 1, 4.0), self._vals(self.line_a, 2, 3.0)])
+        self.assertEqual(self.Queue._get_pending_totals(self.line_a.ids)[self.line_a.id], [7.0, 700.0])
+
+        self.Queue._cron_process_ledger_queue()
+        self.assertEqual(set(items.mapped('state')), {'done'})
+        self.assertEqual(len(items.consumption_id), 2)
+        self.assertEqual(self.line_a.consumed_quantity, 7.0)
+
+        # A second run has nothing left to write
+        self.Queue._cron_process_ledger_queue()
+        self.assertEqual(self.line_a.consumed_quantity, 7.0)
+
+    def test_over_budget_line_fails_alone(self):
+        ok = self.Queue._enqueue([self._vals(self.line_a, 1, 5.0)])
+        ko = self.Queue._enqueue([self._vals(self.line_b, 2, 12.0)])
+
+        self.Queue._cron_process_ledger_queue()
+        self.assertEqual(ok.state, 'done')
+        self.assertEqual(ko.state, 'failed')
+        self.assertTrue(ko.error_message)
+        self.assertEqual(self.line_b.consumed_quantity, 0.0)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import UserError
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestMaterialIssue(TransactionCase):
+    """
+    Verify the issuable quantities of the bulk material issue wizard,
+    including pending issue moves in another UoM, and the transfers it creates.
+    """
+
+    def setUp(self):
+        super(TestMaterialIssue, self).setUp()
+        generator = BOQDataGenerator(self.env, seed=14)
+        generator.LINE_QUANTITY = 24.0
+        products = generator.create_products(2)
+        self.boq = generator.create_boqs(generator.create_projects(1), products, lines=2, section_every=1)
+        self.lines = generator.product_lines(self.boq)
+
+        warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.env.company.id)], limit=1)
+        self.picking_type = warehouse.out_type_id
+        self.location = warehouse.lot_stock_id
+        self.location_dest = self.env.ref('stock.stock_location_customers')
+
+    def _create_wizard(self, lines=None):
+        return self.env['construction.boq.material.issue'].create({
+            'boq_id': self.boq.id,
+            'boq_line_ids': [(6, 0, lines.ids if lines else [])],
+            'picking_type_id': self.picking_type.id,
+            'location_dest_id': self.location_dest.id,
+        })
+
+    def _issuable(self, wizard):
+        return {line.boq_line_id: line.issuable_quantity for line in wizard.issue_line_ids}
+
+    def test_pending_moves_converted(self):
+        # Half a dozen already on its way: 6 units of the first line
+        self.env['stock.move'].create({
+            'name': 'Pending issue',
+            'product_id': self.lines[0].product_id.id,
+            'product_uom_qty': 0.5,
+            'product_uom': self.env.ref('uom.product_uom_dozen').id,
+            'location_id': self.location.id,
+            'location_dest_id': self.location_dest.id,
+            'boq_line_id': self.lines[0].id,
+        })
+        issuable = self._issuable(self._create_wizard())
+        self.assertAlmostEqual(issuable[self.lines[0]], 18.0)
+        self.assertAlmostEqual(issuable[self.lines[1]], 24.0)
+
+    def test_section_selection(self):
+        section = self.boq.boq_line_ids.filtered('display_type')[1]
+        wizard = self._create_wizard(section)
+        self.assertEqual(wizard.issue_line_ids.boq_line_id, self.lines[1])
+        self.assertEqual(wizard.issue_line_ids.section_line_id, section)
+
+    def test_issue_edited_quantities(self):
+        wizard = self._create_wizard()
+        first = wizard.issue_line_ids.filtered(lambda l: l.boq_line_id == self.lines[0])
+        first.quantity = 25.0
+        with self.assertRaises(UserError):
+            wizard.action_issue()
+
+        first.quantity = 10.0
+        action = wizard.action_issue()
+        pickings = self.env['stock.picking'].search(action['domain'])
+        # One transfer per section
+        self.assertEqual(len(pickings), 2)
+        moves = pickings.move_ids
+        self.assertEqual(moves.boq_line_id, self.lines)
+        self.assertAlmostEqual(moves.filtered(lambda m: m.boq_line_id == self.lines[0]).product_uom_qty, 10.0)
+
+        # The pending moves now reduce the issuable quantities
+        issuable = self._issuable(self._create_wizard())
+        self.assertAlmostEqual(issuable[self.lines[0]], 14.0)
+        self.assertNotIn(self.lines[1], issuable)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.modules.registry import Registry
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.models.boq_metric import _get_buffer
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestMetrics(TransactionCase):
+    """
+    Verify that profiled methods only buffer their samples and that the
+    flush cron persists them, logging instead of raising on errors.
+    """
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        self.buffer = _get_buffer(self.env.cr.dbname)
+        self.buffer.clear()
+        self.addCleanup(self.buffer.clear)
+        self.env['ir.config_parameter'].sudo().set_param('sitemate.profiling_enabled', 'True')
+        self.Metric = self.env['construction.boq.metric']
+
+        generator = BOQDataGenerator(self.env, seed=12)
+        self.boq = generator.create_boqs(generator.create_projects(1), generator.create_products(1), lines=1, section_every=0)
+        self.buffer.clear()
+
+    def _metric_count(self):
+        return self.Metric.search_count([('path', '=', 'construction.boq.create_revision_snapshot')])
+
+    def test_samples_buffered_then_flushed(self):
+        # No cursor is opened from the business flow
+        with patch.object(Registry, 'cursor', side_effect=AssertionError("cursor opened while profiling")):
+            self.boq.action_revise()
+        samples = [sample for sample in self.buffer if sample['path'] == 'construction.boq.create_revision_snapshot']
+        self.assertEqual(len(samples), 1)
+        self.assertEqual(self._metric_count(), 0)
+
+        self.Metric._cron_flush_metrics()
+        self.assertFalse(self.buffer)
+        metric = self.Metric.search([('path', '=', 'construction.boq.create_revision_snapshot')])
+        self.assertEqual(len(metric), 1)
+        self.assertEqual(metric.record_count, 1)
+        self.assertGreater(metric.query_count, 0)
+
+    def test_disabled_records_nothing(self):
+        self.env['ir.config_parameter'].sudo().set_param('sitemate.profiling_enabled', 'False')
+        self.boq.action_revise()
+        self.assertFalse(self.buffer)
+
+    def test_flush_errors_logged(self):
+        self.boq.action_revise()
+        with patch.object(type(self.Metric), 'create', side_effect=ValueError("broken")), \
+                self.assertLogs('odoo.addons.sitemate.models.boq_metric', level='ERROR'):
+            self.Metric._cron_flush_metrics()
+        # The failed samples are dropped, the job itself does not fail
+        self.assertFalse(self.buffer)
+        self.assertEqual(self._metric_count(), 0)
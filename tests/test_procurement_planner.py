@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import UserError
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestProcurementPlanner(TransactionCase):
+    """
+    Verify the RFQ generation of the Procurement Planner: remaining
+    quantities, grouping by vendor / lead time / cost type and vendor
+    resolution from the pricelists.
+    """
+
+    def setUp(self):
+        super(TestProcurementPlanner, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=6)
+        self.generator.LINE_QUANTITY = 10.0
+        self.products = self.generator.create_products(3)
+        self.project = self.generator.create_projects(1)
+        self.boq = self.generator.create_boqs(self.project, self.products, lines=3, section_every=0, approve=False)
+        self.material_line, self.labor_line, self.orphan_line = self.generator.product_lines(self.boq)
+        self.material_line.cost_type = 'material'
+        self.labor_line.cost_type = 'labor'
+
+        self.vendor = self.generator.get_vendor()
+        self.env['product.supplierinfo'].create([{
+            'partner_id': self.vendor.id,
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'price': 7.0,
+            'delay': 3,
+        } for product in self.products[:2]])
+
+    def _approve(self):
+        self.boq.action_submit()
+        self.boq.action_approve()
+
+    def _generated_orders(self, action):
+        return self.env['purchase.order'].search(action['domain'])
+
+    def test_draft_boq_rejected(self):
+        with self.assertRaises(UserError):
+            self.boq.action_generate_rfqs()
+
+    def test_rfqs_from_remaining_quantities(self):
+        self._approve()
+        self.generator.create_purchase_orders(self.boq, orders=1, order_lines=1, quantity=4.0)
+
+        orders = self._generated_orders(self.boq.action_generate_rfqs())
+        # Same vendor and lead time, but two cost types: two RFQs
+        self.assertEqual(len(orders), 2)
+        self.assertEqual(set(orders.mapped('state')), {'draft'})
+        self.assertEqual(set(orders.mapped('purchase_type')), {'boq'})
+        self.assertEqual(orders.partner_id, self.vendor)
+        self.assertEqual(orders.boq_id, self.boq)
+
+        order_lines = orders.order_line
+        self.assertEqual(order_lines.boq_line_id, self.material_line | self.labor_line)
+        by_line = {line.boq_line_id: line for line in order_lines}
+        self.assertAlmostEqual(by_line[self.material_line].product_qty, 6.0)
+        self.assertAlmostEqual(by_line[self.labor_line].product_qty, 10.0)
+        self.assertAlmostEqual(by_line[self.labor_line].price_unit, 7.0)
+
+        # The product without vendor is reported on the BOQ
+        self.assertIn(self.orphan_line.name, self.boq.message_ids[0].body)
+
+    def test_vendor_map_prefers_variant_entries(self):
+        product = self.products[0]
+        variant_vendor = self.generator.get_vendor()
+        variant_seller = self.env['product.supplierinfo'].create({
+            'partner_id': variant_vendor.id,
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_id': product.id,
+            'price': 9.0,
+            'sequence': 100,
+        })
+        vendor_map = self.boq._get_vendor_map(self.products)
+        self.assertEqual(vendor_map[product.id], variant_seller)
+        self.assertEqual(vendor_map[self.products[1].id].partner_id, self.vendor)
+        self.assertNotIn(self.products[2].id, vendor_map)
+
+    def test_nothing_to_procure(self):
+        self._approve()
+        self.env['product.supplierinfo'].create({
+            'partner_id': self.vendor.id,
+            'product_tmpl_id': self.products[2].product_tmpl_id.id,
+            'price': 7.0,
+        })
+        self.boq.action_generate_rfqs()
+        with self.assertRaises(UserError):
+            self.boq.action_generate_rfqs()
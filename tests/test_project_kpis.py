@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestProjectKPIs(TransactionCase):
+    """
+    Verify that the stored BOQ KPIs of projects follow the BOQ, purchase and
+    ledger changes, including the deferred recompute mode.
+    """
+
+    def setUp(self):
+        super(TestProjectKPIs, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=4)
+        self.generator.LINE_QUANTITY = 10.0
+        products = self.generator.create_products(2)
+        self.project = self.generator.create_projects(1)
+        self.boq = self.generator.create_boqs(self.project, products, lines=2, section_every=0, approve=False)
+        self.lines = self.generator.product_lines(self.boq)
+        self.budget = sum(self.lines.mapped('budget_amount'))
+
+    def _approve(self):
+        self.boq.action_submit()
+        self.boq.action_approve()
+
+    def _consume(self, env, line, quantity):
+        env['construction.boq.consumption'].create({
+            'boq_line_id': line.id,
+            'source_model': 'test.model',
+            'source_id': line.id,
+            'quantity': quantity,
+            'amount': quantity * line.estimated_rate,
+        })
+
+    def _stored_kpis(self):
+        """KPIs as committed to project_project."""
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT boq_budget_total, boq_consumed_amount, boq_budget_variance, boq_over_budget_line_count
+              FROM project_project WHERE id = %s
+        """, (self.project.id,))
+        return self.env.cr.fetchone()
+
+    def test_budget_after_approval_and_revision(self):
+        # Draft BOQs are not budgets yet
+        self.assertEqual(self.project.boq_budget_total, 0.0)
+        self._approve()
+        self.assertAlmostEqual(self.project.boq_budget_total, self.budget)
+
+        # The revision is back in draft and the archived snapshot is not counted
+        line = self.lines[0]
+        line.quantity = 20.0
+        self.assertFalse(self.boq.previous_boq_id.active)
+        self.assertEqual(self.project.boq_budget_total, 0.0)
+        self._approve()
+        self.assertAlmostEqual(self.project.boq_budget_total, self.budget + 10.0 * line.estimated_rate)
+
+    def test_draft_boq_next_to_approved(self):
+        self._approve()
+        products = self.generator.create_products(1)
+        draft_boq = self.generator.create_boqs(self.project, products, lines=1, section_every=0, approve=False)
+        draft_line = self.generator.product_lines(draft_boq)
+        draft_line.allow_over_consumption = True
+        self._consume(self.env, draft_line, 20.0)
+
+        self.assertAlmostEqual(self.project.boq_budget_total, self.budget)
+        self.assertEqual(self.project.boq_consumed_amount, 0.0)
+        self.assertEqual(self.project.boq_over_budget_line_count, 0)
+
+    def test_committed_after_purchase(self):
+        self._approve()
+        line = self.lines[0]
+        order = self.generator.create_purchase_orders(self.boq, orders=1, order_lines=1, quantity=4.0)
+        self.assertAlmostEqual(self.project.boq_committed_amount, 4.0 * line.estimated_rate)
+        order.button_cancel()
+        self.assertAlmostEqual(self.project.boq_committed_amount, 0.0)
+
+    def test_consumed_after_ledger_entry(self):
+        line = self.lines[0]
+        # Set before approval: changing an approved line creates a revision
+        line.allow_over_consumption = True
+        self._approve()
+        self._consume(self.env, line, 4.0)
+        self.assertAlmostEqual(self.project.boq_consumed_amount, 4.0 * line.estimated_rate)
+        self.assertAlmostEqual(self.project.boq_budget_variance, self.budget - 4.0 * line.estimated_rate)
+        self.assertAlmostEqual(self.project.boq_progress, 400.0 * line.estimated_rate / self.budget)
+        self.assertEqual(self.project.boq_over_budget_line_count, 0)
+
+        self._consume(self.env, line, 8.0)
+        self.assertEqual(self.project.boq_over_budget_line_count, 1)
+
+    def test_consumed_after_deferred_ledger_entry(self):
+        self._approve()
+        line = self.lines[0]
+        deferred_env = self.env(context=dict(self.env.context, boq_defer_recompute=True))
+        self._consume(deferred_env, line, 4.0)
+        deferred_env.flush_all()
+        self.assertAlmostEqual(self._stored_kpis()[1], 0.0)
+
+        # Runs the precommit hooks like a commit would
+        self.env.cr.flush()
+        budget, consumed, variance, over_budget = self._stored_kpis()
+        self.assertAlmostEqual(budget, self.budget)
+        self.assertAlmostEqual(consumed, 4.0 * line.estimated_rate)
+        self.assertAlmostEqual(variance, self.budget - 4.0 * line.estimated_rate)
+        self.assertEqual(over_budget, 0)
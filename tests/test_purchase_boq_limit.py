@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+
+class TestPurchaseBOQLimit(TransactionCase):
+    """
+    Verify the BOQ purchasing gatekeeper on Purchase Order Lines,
+    including conversion of PO quantities into the BOQ line UoM.
+    """
+
+    def setUp(self):
+        super(TestPurchaseBOQLimit, self).setUp()
+
+        self.project = self.env['project.project'].create({'name': 'Test Project'})
+        self.boq = self.env['construction.boq'].create({
+            'project_id': self.project.id,
+            'name': 'Test BOQ',
+            'state': 'approved'
+        })
+        self.product = self.env['product.product'].create({'name': 'Test Product', 'standard_price': 10})
+        self.uom_unit = self.env.ref('uom.product_uom_unit')
+        self.uom_dozen = self.env.ref('uom.product_uom_dozen')
+        self.vendor = self.env['res.partner'].create({'name': 'Test Vendor'})
+
+        # Budget: 24 Units
+        self.boq_line = self.env['construction.boq.line'].create({
+            'boq_id': self.boq.id,
+            'product_id': self.product.id,
+            'quantity': 24.0,
+            'estimated_rate': 10.0,
+            'uom_id': self.uom_unit.id,
+            'expense_account_id': self.env['account.account'].search([], limit=1).id
+        })
+
+    def _create_boq_po(self, qty, uom):
+        return self.env['purchase.order'].create({
+            'partner_id': self.vendor.id,
+            'purchase_type': 'boq',
+            'project_id': self.project.id,
+            'boq_id': self.boq.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'name': self.product.name,
+                'product_qty': qty,
+                'product_uom': uom.id,
+                'price_unit': 10.0,
+                'boq_line_id': self.boq_line.id,
+            })]
+        })
+
+    def test_limit_within_budget_other_uom(self):
+        """2 Dozen = 24 Units fits exactly in the budget."""
+        self._create_boq_po(2.0, self.uom_dozen)
+        self.assertAlmostEqual(self.boq_line.ordered_quantity, 24.0)
+        self.assertAlmostEqual(self.boq_line.remaining_quantity, 0.0)
+        self.assertTrue(self.boq_line.is_complete)
+
+    def test_limit_exceeded_other_uom(self):
+        """3 Dozen = 36 Units exceeds a 24 Units budget."""
+        with self.assertRaises(ValidationError):
+            self._create_boq_po(3.0, self.uom_dozen)
+
+    def test_limit_exceeded_across_orders(self):
+        """Quantities of all non-cancelled POs count towards the limit."""
+        self._create_boq_po(20.0, self.uom_unit)
+        with self.assertRaises(ValidationError):
+            self._create_boq_po(1.0, self.uom_dozen)
+
+    def test_line_index_invalidated_on_completion_only(self):
+        """Ordering only invalidates the cached line index when the line completes."""
+        def index_version():
+            self.env.flush_all()
+            self.boq.invalidate_recordset(['line_index_version'])
+            return self.boq.line_index_version
+
+        version = index_version()
+        self._create_boq_po(12.0, self.uom_unit)
+        self.assertEqual(index_version(), version)
+        self._create_boq_po(1.0, self.uom_dozen)
+        self.assertTrue(self.boq_line.is_complete)
+        self.assertNotEqual(index_version(), version)
+
+    def test_allowed_products_follow_line_index(self):
+        """The allowed products of a BOQ PO see added, removed and completed lines."""
+        order = self._create_boq_po(1.0, self.uom_unit)
+
+        def allowed_products():
+            order.invalidate_recordset(['boq_product_ids'])
+            return order.boq_product_ids
+
+        self.assertEqual(allowed_products(), self.product)
+
+        other_product = self.env['product.product'].create({'name': 'Other Product', 'standard_price': 5})
+        other_line = self.env['construction.boq.line'].create({
+            'boq_id': self.boq.id,
+            'product_id': other_product.id,
+            'quantity': 5.0,
+            'estimated_rate': 5.0,
+            'uom_id': self.uom_unit.id,
+            'expense_account_id': self.boq_line.expense_account_id.id,
+        })
+        self.assertEqual(allowed_products(), self.product | other_product)
+
+        other_line.unlink()
+        self.assertEqual(allowed_products(), self.product)
+
+        # Ordering the rest of the budget completes the line
+        self._create_boq_po(23.0, self.uom_unit)
+        self.assertFalse(allowed_products())
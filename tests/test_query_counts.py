@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+# Recordset sizes each hot path is measured on
+SIZES = (1, 10, 100)
+# Extra queries tolerated between the smallest and the largest size
+# (e.g. a second batch of a chunked read); anything more is an N+1.
+QUERY_GROWTH_TOLERANCE = 5
+
+
+class TestQueryCounts(TransactionCase):
+    """
+    Query-count regression guards for the BOQ hot paths: the number of SQL
+    queries must not grow with the number of records processed.
+    Where the standard Odoo flow itself scales with the records (stock
+    moves, journal entries), the SiteMate overhead is measured against the
+    same flow without BOQ links.
+    """
+
+    def setUp(self):
+        super(TestQueryCounts, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=1)
+        products = self.generator.create_products(max(SIZES))
+        projects = self.generator.create_projects(1)
+        self.boq = self.generator.create_boqs(projects, products, lines=max(SIZES), section_every=10)
+        self.boq_lines = self.generator.product_lines(self.boq)
+
+    def count_queries(self, func):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        before = self.env.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - before
+
+    def measure(self, prepare, run):
+        """
+        Query counts per size. ``prepare(size)`` builds the records (not
+        counted), ``run(records)`` is the measured call. A first run at the
+        smallest size warms up the caches.
+        """
+        run(prepare(SIZES[0]))
+        counts = {}
+        for size in SIZES:
+            records = prepare(size)
+            counts[size] = self.count_queries(lambda: run(records))
+        return counts
+
+    def assertQueryCountStable(self, counts, path):
+        growth = counts[SIZES[-1]] - counts[SIZES[0]]
+        self.assertLessEqual(
+            growth, QUERY_GROWTH_TOLERANCE,
+            "%s: query count grows with the number of records %s" % (path, counts),
+        )
+
+    # -------------------------------------------------------------------------
+    # HOT PATHS
+    # -------------------------------------------------------------------------
+    def test_revision_snapshot(self):
+        def prepare(size):
+            projects = self.generator.create_projects(1)
+            return self.generator.create_boqs(projects, self.boq_lines.product_id, lines=size, section_every=10)
+
+        counts = self.measure(prepare, lambda boq: boq.create_revision_snapshot())
+        self.assertQueryCountStable(counts, 'construction.boq.create_revision_snapshot')
+
+    def test_consumption_create(self):
+        Consumption = self.env['construction.boq.consumption']
+
+        def prepare(size):
+            return self.generator.prepare_ledger_vals(self.boq_lines[:size], size)
+
+        counts = self.measure(prepare, Consumption.create)
+        self.assertQueryCountStable(counts, 'construction.boq.consumption.create')
+
+    def test_stock_move_action_done(self):
+        def prepare(size, linked=True):
+            pickings = self.generator.create_pickings(self.boq, pickings=1, picking_lines=size)
+            if not linked:
+                pickings.write({'project_id': False})
+                pickings.move_ids.write({'boq_line_id': False})
+            return pickings.move_ids
+
+        run = lambda moves: moves._action_done()
+        linked = self.measure(prepare, run)
+        baseline = self.measure(lambda size: prepare(size, linked=False), run)
+        overhead = {size: linked[size] - baseline[size] for size in SIZES}
+        self.assertQueryCountStable(overhead, 'stock.move._action_done')
+
+    def test_account_move_action_post(self):
+        def prepare(size, linked=True):
+            bills = self.generator.create_bills(self.boq, bills=1, bill_lines=size)
+            if not linked:
+                bills.invoice_line_ids.write({'boq_line_id': False})
+            return bills
+
+        run = lambda bills: bills.action_post()
+        linked = self.measure(prepare, run)
+        baseline = self.measure(lambda size: prepare(size, linked=False), run)
+        overhead = {size: linked[size] - baseline[size] for size in SIZES}
+        self.assertQueryCountStable(overhead, 'account.move.action_post')
+
+    def test_purchase_check_boq_limit(self):
+        def prepare(size):
+            orders = self.generator.create_purchase_orders(self.boq, orders=1, order_lines=size, quantity=1.0, confirm=False)
+            return orders.order_line
+
+        counts = self.measure(prepare, lambda po_lines: po_lines._check_boq_limit())
+        self.assertQueryCountStable(counts, 'purchase.order.line._check_boq_limit')
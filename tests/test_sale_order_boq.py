@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestSaleOrderBOQ(TransactionCase):
+    """
+    Verify the server-side BOQ generation from confirmed Sales Orders,
+    synchronous and queued, and the BOQ rollups stored on the orders.
+    """
+
+    def setUp(self):
+        super(TestSaleOrderBOQ, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=11)
+        self.project = self.generator.create_projects(1)
+        self.products = self.generator.create_products(2)
+        self.customer = self.env['res.partner'].create({'name': 'Test Customer'})
+
+        # Product without its own expense account: falls back to its category
+        self.category_account = self.generator.get_expense_account()
+        self.category = self.env['product.category'].create({
+            'name': 'BOQ Test Category',
+            'property_account_expense_categ_id': self.category_account.id,
+        })
+        self.products[1].write({'property_account_expense_id': False, 'categ_id': self.category.id})
+
+    def _create_order(self, products=None, project=None, confirm=True, **vals):
+        products = products if products is not None else self.products
+        order_lines = [(0, 0, {'display_type': 'line_section', 'name': 'Structure'})]
+        order_lines += [(0, 0, {
+            'product_id': product.id,
+            'product_uom_qty': 3.0,
+            'price_unit': product.standard_price * 2,
+        }) for product in products]
+        order = self.env['sale.order'].create({
+            'partner_id': self.customer.id,
+            'project_id': (project if project is not None else self.project).id,
+            'order_line': order_lines,
+            **vals,
+        })
+        if confirm:
+            order.action_confirm()
+        return order
+
+    def test_generate_sync(self):
+        order = self._create_order()
+        action = order.action_generate_boq()
+        boq = self.env['construction.boq'].browse(action['res_id'])
+
+        self.assertEqual(boq.sale_order_id, order)
+        self.assertEqual(boq.project_id, self.project)
+        self.assertEqual(boq.state, 'draft')
+        self.assertEqual(len(boq.boq_line_ids), 3)
+        self.assertEqual(boq.boq_line_ids[0].display_type, 'line_section')
+
+        first, second = boq.boq_line_ids.filtered(lambda l: not l.display_type)
+        self.assertEqual(first.expense_account_id, self.products[0].property_account_expense_id)
+        self.assertEqual(second.expense_account_id, self.category_account)
+        for line, product in zip(first | second, self.products):
+            # Budgeted at cost, not at the sales price
+            self.assertAlmostEqual(line.estimated_rate, product.standard_price)
+            self.assertAlmostEqual(line.quantity, 3.0)
+        self.assertFalse(order.boq_generation_queued)
+
+    def test_draft_order_rejected(self):
+        order = self._create_order(confirm=False)
+        with self.assertRaises(UserError):
+            order.action_generate_boq()
+        self.assertFalse(order.boq_ids)
+
+    def test_generate_queued_large_order(self):
+        order = self._create_order()
+        with patch('odoo.addons.sitemate.models.sale_order.BOQ_SYNC_LINE_LIMIT', 1):
+            action = order.action_generate_boq()
+        self.assertEqual(action['type'], 'ir.actions.client')
+        self.assertTrue(order.boq_generation_queued)
+        self.assertFalse(order.boq_ids)
+
+        self.env['sale.order']._cron_generate_queued_boqs()
+        self.assertFalse(order.boq_generation_queued)
+        self.assertEqual(len(order.boq_ids.boq_line_ids), 3)
+
+    def test_generate_queued_errors_captured(self):
+        orders = self._create_order() | self._create_order(project=self.env['project.project'])
+        orders.action_generate_boq()
+        self.assertTrue(all(orders.mapped('boq_generation_queued')))
+
+        self.env['sale.order']._cron_generate_queued_boqs()
+        good, failed = orders
+        self.assertEqual(len(good.boq_ids), 1)
+        self.assertFalse(good.boq_generation_error)
+        # The failing order is reported and dequeued, without blocking the batch
+        self.assertFalse(failed.boq_ids)
+        self.assertFalse(failed.boq_generation_queued)
+        self.assertIn('no project', failed.boq_generation_error)
+
+    def test_line_vals_prefetched_in_bulk(self):
+        """Resolving costs and accounts does not query per product."""
+        Boq = self.env['construction.boq']
+
+        def count_queries(order):
+            self.env.invalidate_all()
+            start = self.env.cr.sql_log_count
+            Boq._prepare_line_vals_from_sale_order(order)
+            return self.env.cr.sql_log_count - start
+
+        small_order = self._create_order(products=self.products[:1])
+        large_order = self._create_order(products=self.generator.create_products(10))
+        self.assertEqual(count_queries(large_order), count_queries(small_order))
+
+    def test_rollups_in_foreign_currency(self):
+        company_currency = self.env.company.currency_id
+        currency = self.env['res.currency'].with_context(active_test=False).search([
+            ('name', 'in', ('EUR', 'USD')), ('id', '!=', company_currency.id),
+        ], limit=1)
+        currency.active = True
+        # 2 units of the foreign currency per unit of company currency
+        self.env['res.currency.rate'].create({
+            'name': '2000-01-01',
+            'currency_id': currency.id,
+            'rate': 2.0 * company_currency.with_context(date='2000-01-01').rate,
+            'company_id': self.env.company.id,
+        })
+        pricelist = self.env['product.pricelist'].create({'name': 'Foreign Pricelist', 'currency_id': currency.id})
+        order = self._create_order(pricelist_id=pricelist.id)
+        self.assertEqual(order.currency_id, currency)
+        self.assertEqual(order.boq_count, 0)
+        self.assertEqual(order.boq_budget_margin, 0.0)
+
+        boq = self.env['construction.boq'].browse(order.action_generate_boq()['res_id'])
+        sold = order.amount_untaxed / 2.0
+        self.assertEqual(order.boq_count, 1)
+        self.assertAlmostEqual(order.boq_budget_total, boq.total_budget)
+        self.assertAlmostEqual(order.boq_budget_margin, sold - boq.total_budget, places=2)
+        self.assertAlmostEqual(order.boq_budget_margin_percent, (sold - boq.total_budget) / sold * 100.0, places=2)
+
+        # Budget changes on the BOQ lines flow into the stored margin
+        line = boq.boq_line_ids.filtered(lambda l: not l.display_type)[0]
+        line.quantity += 10.0
+        self.assertAlmostEqual(order.boq_budget_total, boq.total_budget)
+        self.assertAlmostEqual(order.boq_budget_margin, sold - boq.total_budget, places=2)
+
+        # Searchable and sortable by margin
+        found = self.env['sale.order'].search([('id', '=', order.id), ('boq_budget_margin', '<', sold)], order='boq_budget_margin')
+        self.assertEqual(found, order)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestStockAutoLink(TransactionCase):
+    """
+    Verify the automatic linking of stock moves to the active BOQ line of
+    their transfer's project, on picking create / write / confirm and in bulk.
+    """
+
+    def setUp(self):
+        super(TestStockAutoLink, self).setUp()
+        generator = BOQDataGenerator(self.env, seed=5)
+        self.product = generator.create_products(1)
+        self.project = generator.create_projects(1)
+        # Two lines for the same product: the first one by sequence is the match
+        self.boq = generator.create_boqs(self.project, self.product, lines=2, section_every=0)
+        self.first_line, self.second_line = generator.product_lines(self.boq)
+
+        warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.env.company.id)], limit=1)
+        self.picking_type = warehouse.out_type_id
+        self.location = warehouse.lot_stock_id
+        self.location_dest = self.env.ref('stock.stock_location_customers')
+
+    def _create_picking(self, project=False, moves=1):
+        return self.env['stock.picking'].create({
+            'picking_type_id': self.picking_type.id,
+            'location_id': self.location.id,
+            'location_dest_id': self.location_dest.id,
+            'project_id': project and project.id,
+            'move_ids': [(0, 0, {
+                'name': self.product.name,
+                'product_id': self.product.id,
+                'product_uom_qty': 1.0,
+                'product_uom': self.product.uom_id.id,
+                'location_id': self.location.id,
+                'location_dest_id': self.location_dest.id,
+            }) for _i in range(moves)],
+        })
+
+    def test_link_on_create(self):
+        picking = self._create_picking(self.project)
+        self.assertEqual(picking.move_ids.boq_line_id, self.first_line)
+
+    def test_link_on_write_and_confirm(self):
+        picking = self._create_picking()
+        self.assertFalse(picking.move_ids.boq_line_id)
+        picking.project_id = self.project
+        self.assertEqual(picking.move_ids.boq_line_id, self.first_line)
+
+        picking = self._create_picking()
+        # Project set without going through write(): confirm links the moves
+        self.env.cr.execute("UPDATE stock_picking SET project_id = %s WHERE id = %s", (self.project.id, picking.id))
+        picking.invalidate_recordset(['project_id'])
+        picking.action_confirm()
+        self.assertEqual(picking.move_ids.boq_line_id, self.first_line)
+
+    def test_closed_and_linked_moves_untouched(self):
+        picking = self._create_picking(moves=3)
+        cancelled, done, linked = picking.move_ids
+        cancelled._action_cancel()
+        done.quantity = 1.0
+        done.picked = True
+        done._action_done()
+        linked.boq_line_id = self.second_line
+
+        picking.project_id = self.project
+        self.assertFalse(cancelled.boq_line_id)
+        self.assertFalse(done.boq_line_id)
+        self.assertEqual(linked.boq_line_id, self.second_line)
+
+    def test_draft_boq_not_linked(self):
+        self.boq.action_revise()
+        self.assertEqual(self.boq.state, 'draft')
+        picking = self._create_picking(self.project)
+        self.assertFalse(picking.move_ids.boq_line_id)
+
+    def test_bulk_link(self):
+        pickings = self._create_picking(moves=2) | self._create_picking(moves=1)
+        self.env.cr.execute("UPDATE stock_picking SET project_id = %s WHERE id IN %s", (self.project.id, tuple(pickings.ids)))
+        pickings.invalidate_recordset(['project_id'])
+
+        self.assertEqual(self.env['stock.move']._cron_boq_auto_link(batch_size=2), 3)
+        self.assertEqual(pickings.move_ids.boq_line_id, self.first_line)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.sitemate.tools.data_generator import BOQDataGenerator
+
+class TestTaskCosts(TransactionCase):
+    """
+    Verify the stored BOQ cost and earned-value indicators of tasks:
+    budget, committed, actual cost, EV, PV, CPI and SPI.
+    """
+
+    def setUp(self):
+        super(TestTaskCosts, self).setUp()
+        self.generator = BOQDataGenerator(self.env, seed=10)
+        self.generator.LINE_QUANTITY = 10.0
+        self.products = self.generator.create_products(2)
+        self.project = self.generator.create_projects(1)
+        self.task = self.env['project.task'].create({'name': 'Foundations', 'project_id': self.project.id})
+
+        self.boq = self.generator.create_boqs(self.project, self.products, lines=2, section_every=0, approve=False)
+        self.line = self.generator.product_lines(self.boq)[0]
+        self.line.task_id = self.task
+
+    def _approve(self):
+        self.boq.action_submit()
+        self.boq.action_approve()
+
+    def _consume(self, quantity):
+        self.env['construction.boq.consumption'].create({
+            'boq_line_id': self.line.id,
+            'source_model': 'test.model',
+            'source_id': self.line.id,
+            'quantity': quantity,
+            'amount': quantity * self.line.estimated_rate,
+        })
+
+    def test_draft_boq_not_budgeted(self):
+        self.assertEqual(self.task.boq_budget_amount, 0.0)
+        self._approve()
+        self.assertAlmostEqual(self.task.boq_budget_amount, self.line.budget_amount)
+
+        # A new draft BOQ on the same project is not counted
+        draft_boq = self.generator.create_boqs(self.project, self.products, lines=1, section_every=0, approve=False)
+        draft_boq.boq_line_ids.task_id = self.task
+        self.assertAlmostEqual(self.task.boq_budget_amount, self.line.budget_amount)
+
+    def test_costs_after_purchase_and_ledger(self):
+        self._approve()
+        rate = self.line.estimated_rate
+        self.generator.create_purchase_orders(self.boq, orders=1, order_lines=1, quantity=4.0)
+        self.assertAlmostEqual(self.task.boq_committed_amount, 4.0 * rate)
+        # Nothing consumed yet
+        self.assertEqual(self.task.boq_actual_cost, 0.0)
+        self.assertEqual(self.task.boq_cpi, 0.0)
+
+        self._consume(2.0)
+        self.assertAlmostEqual(self.task.boq_actual_cost, 2.0 * rate)
+        self.assertAlmostEqual(self.task.boq_earned_value, self.line.budget_amount * 0.2)
+        self.assertAlmostEqual(self.task.boq_cpi, 1.0)
+
+    def test_schedule_after_planned_date_change(self):
+        self._approve()
+        self._consume(5.0)
+        budget = self.line.budget_amount
+        # No deadline: no planned value, no SPI
+        self.assertEqual(self.task.boq_planned_value, 0.0)
+        self.assertEqual(self.task.boq_spi, 0.0)
+
+        # Past the deadline the whole budget is planned
+        self.task.date_deadline = fields.Datetime.now() - timedelta(days=1)
+        self.assertAlmostEqual(self.task.boq_planned_value, budget)
+        self.assertAlmostEqual(self.task.boq_spi, 0.5)
+
+        self.task.date_deadline = False
+        self.assertEqual(self.task.boq_planned_value, 0.0)
+        self.assertEqual(self.task.boq_spi, 0.0)
+
+    def test_task_without_budget(self):
+        task = self.env['project.task'].create({
+            'name': 'Handover',
+            'project_id': self.project.id,
+            'date_deadline': fields.Datetime.now() - timedelta(days=1),
+        })
+        self.assertEqual(task.boq_budget_amount, 0.0)
+        self.assertEqual(task.boq_planned_value, 0.0)
+        self.assertEqual(task.boq_cpi, 0.0)
+        self.assertEqual(task.boq_spi, 0.0)
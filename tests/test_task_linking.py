@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+class TestTaskLinking(TransactionCase):
+    """
+    Verify the bulk linking of BOQ lines and tasks by activity code: lines of
+    draft BOQs are linked, archived revisions are never rewritten.
+    """
+
+    def setUp(self):
+        super(TestTaskLinking, self).setUp()
+
+        self.project = self.env['project.project'].create({'name': 'Test Project'})
+        self.task = self.env['project.task'].create({
+            'name': 'Excavation',
+            'project_id': self.project.id,
+            'activity_code': 'EXC-01',
+        })
+        self.product = self.env['product.product'].create({'name': 'Test Product', 'standard_price': 100})
+        self.account = self.env['account.account'].search([], limit=1)
+
+    def _create_boq(self, **vals):
+        return self.env['construction.boq'].create(dict({
+            'project_id': self.project.id,
+            'name': 'Test BOQ',
+            'boq_line_ids': [(0, 0, {
+                'product_id': self.product.id,
+                'name': 'Excavation works',
+                'quantity': 10.0,
+                'estimated_rate': 100.0,
+                'uom_id': self.env.ref('uom.product_uom_unit').id,
+                'expense_account_id': self.account.id,
+                'activity_code': 'exc-01',
+            })],
+        }, **vals))
+
+    def test_link_draft_lines(self):
+        boq = self._create_boq()
+        report = self.env['construction.boq.line']._link_tasks_by_activity_code(self.project.ids)
+        self.assertEqual(report['linked_lines'], 1)
+        self.assertEqual(boq.boq_line_ids.task_id, self.task)
+        self.assertEqual(self.task.boq_line_ids, boq.boq_line_ids)
+
+    def test_archived_revision_untouched(self):
+        snapshot = self._create_boq(name='Test BOQ (v1)', active=False, version=1)
+        self._create_boq(name='Test BOQ (v2)', version=2)
+        self.env['construction.boq.line']._link_tasks_by_activity_code(self.project.ids)
+        self.assertFalse(snapshot.boq_line_ids.task_id)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Timed BOQ scenarios on a generated data set.
+
+Each scenario is measured in wall time and SQL queries (pending ORM writes are
+flushed inside the measurement, caches are cleared before it). The results are
+plain dicts so they can be dumped as JSON and compared across versions.
+"""
+import platform
+import time
+
+from odoo import release
+
+from .data_generator import BOQDataGenerator
+
+DEFAULT_PARAMS = {
+    'seed': 0,
+    'projects': 2,
+    'lines': 200,
+    'section_every': 20,
+    'orders': 2,
+    'order_lines': 50,
+    'pickings': 2,
+    'picking_lines': 50,
+    'bills': 2,
+    'bill_lines': 50,
+    'ledger_entries': 1000,
+}
+
+
+class BOQBenchmark:
+
+    def __init__(self, env, **params):
+        self.env = env
+        self.params = dict(DEFAULT_PARAMS, **params)
+        self.results = []
+
+    def measure(self, name, records, func):
+        """Run ``func`` and record its wall time and query count."""
+        cr = self.env.cr
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries_before = cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        elapsed = time.perf_counter() - start
+        result = {
+            'scenario': name,
+            'records': records,
+            'seconds': round(elapsed, 6),
+            'queries': cr.sql_log_count - queries_before,
+        }
+        self.results.append(result)
+        return result
+
+    def run(self):
+        """Generate the data set, run every scenario and return the report dict."""
+        params = self.params
+        generator = BOQDataGenerator(self.env, seed=params['seed'])
+
+        start = time.perf_counter()
+        data = generator.generate(**{key: value for key, value in params.items() if key != 'seed'})
+        setup_seconds = time.perf_counter() - start
+
+        boqs = data['boqs']
+        boq_lines = data['boq_lines']
+
+        # Ledger writes through the locking service and the budget checks
+        ledger_vals = generator.prepare_ledger_vals(boq_lines, params['ledger_entries'])
+        self.measure('ledger.bulk_consumption', len(ledger_vals),
+                     lambda: self.env['construction.boq.consumption'].create(ledger_vals))
+
+        bills = data['bills']
+        self.measure('account_move.action_post', len(bills.invoice_line_ids), bills.action_post)
+
+        moves = data['pickings'].move_ids
+        self.measure('stock_move.action_done', len(moves), moves._action_done)
+
+        po_lines = data['purchase_orders'].order_line
+        self.measure('purchase_order_line.check_boq_limit', len(po_lines), po_lines._check_boq_limit)
+
+        Report = self.env['construction.boq.report']
+        report_domain = [('boq_id', 'in', boqs.ids)]
+        self.measure('report.search_read', len(boq_lines),
+                     lambda: Report.search_read(report_domain, ['boq_line_id', 'budget_amount', 'consumed_amount']))
+        self.measure('report.read_group', len(boq_lines),
+                     lambda: Report._read_group(report_domain, ['boq_id', 'cost_type'],
+                                                ['budget_amount:sum', 'consumed_amount:sum']))
+
+        # Last: snapshots move the BOQs back to draft
+        self.measure('boq.create_revision_snapshot', len(boq_lines), boqs.create_revision_snapshot)
+
+        return {
+            'odoo_version': release.version,
+            'python_version': platform.python_version(),
+            'machine': platform.machine(),
+            'params': params,
+            'setup_seconds': round(setup_seconds, 6),
+            'scenarios': self.results,
+        }
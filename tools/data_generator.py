@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic construction data for benchmarks and query-count tests.
+
+All records are created through the ORM (so the module's overrides run as in
+production) and in batches, so generating large data sets stays cheap.
+Values derive from a seeded random generator: the same parameters always give
+the same data set.
+"""
+import random
+
+from odoo import fields
+
+
+class BOQDataGenerator:
+    """
+    Usage::
+
+        gen = BOQDataGenerator(env, seed=42)
+        data = gen.generate(projects=2, lines=500, section_every=25,
+                            orders=5, order_lines=50, pickings=5, picking_lines=20,
+                            bills=5, bill_lines=20, ledger_entries=1000)
+
+    Every ``create_*`` method can also be used on its own.
+    """
+
+    # Budget quantity of each generated line: large enough that the default
+    # PO / issue / bill quantities never hit the BOQ limits.
+    LINE_QUANTITY = 1000.0
+
+    def __init__(self, env, seed=0, company=None):
+        self.env = env
+        self.company = company or env.company
+        self.random = random.Random(seed)
+        self._counter = 0
+
+    def _next_name(self, prefix):
+        self._counter += 1
+        return '%s %05d' % (prefix, self._counter)
+
+    # -------------------------------------------------------------------------
+    # MASTER DATA
+    # -------------------------------------------------------------------------
+    def get_expense_account(self):
+        Account = self.env['account.account']
+        account = Account.search([
+            *Account._check_company_domain(self.company),
+            ('account_type', '=', 'expense'),
+        ], limit=1)
+        if not account:
+            account = Account.create({
+                'name': 'SiteMate Benchmark Expense',
+                'code': 'SMBX%03d' % self.random.randint(0, 999),
+                'account_type': 'expense',
+            })
+        return account
+
+    def get_vendor(self):
+        return self.env['res.partner'].create({'name': self._next_name('Benchmark Vendor')})
+
+    def create_products(self, count):
+        expense_account = self.get_expense_account()
+        uom_unit = self.env.ref('uom.product_uom_unit')
+        return self.env['product.product'].create([{
+            'name': self._next_name('Benchmark Material'),
+            'type': 'consu',
+            'uom_id': uom_unit.id,
+            'uom_po_id': uom_unit.id,
+            'standard_price': round(self.random.uniform(5.0, 500.0), 2),
+            'property_account_expense_id': expense_account.id,
+        } for _i in range(count)])
+
+    def create_projects(self, count):
+        plan = self.env['account.analytic.plan'].create({'name': self._next_name('Benchmark Plan')})
+        analytic_accounts = self.env['account.analytic.account'].create([{
+            'name': self._next_name('Benchmark Site'),
+            'plan_id': plan.id,
+            'company_id': self.company.id,
+        } for _i in range(count)])
+        return self.env['project.project'].create([{
+            'name': account.name,
+            'account_id': account.id,
+            'company_id': self.company.id,
+        } for account in analytic_accounts])
+
+    # -------------------------------------------------------------------------
+    # BOQ
+    # -------------------------------------------------------------------------
+    def create_boqs(self, projects, products, lines=100, section_every=10, approve=True):
+        """One BOQ per project with ``lines`` product lines, a section every ``section_every`` lines."""
+        Boq = self.env['construction.boq']
+        boqs = Boq.create([{
+            'name': '%s - BOQ' % project.name,
+            'project_id': project.id,
+            'analytic_account_id': project.account_id.id,
+            'company_id': self.company.id,
+        } for project in projects])
+
+        cost_types = ['material', 'labor', 'subcontract', 'service', 'overhead']
+        line_vals_list = []
+        for boq in boqs:
+            sequence = 0
+            for index in range(lines):
+                if section_every and index % section_every == 0:
+                    sequence += 1
+                    line_vals_list.append({
+                        'boq_id': boq.id,
+                        'display_type': 'line_section',
+                        'name': 'Section %d' % (index // section_every + 1),
+                        'sequence': sequence,
+                    })
+                product = products[index % len(products)]
+                sequence += 1
+                line_vals_list.append({
+                    'boq_id': boq.id,
+                    'product_id': product.id,
+                    'name': product.name,
+                    'quantity': self.LINE_QUANTITY,
+                    'estimated_rate': product.standard_price,
+                    'uom_id': product.uom_id.id,
+                    'expense_account_id': product.property_account_expense_id.id,
+                    'cost_type': self.random.choice(cost_types),
+                    'activity_code': 'ACT-%04d' % (index // (section_every or lines) + 1),
+                    'sequence': sequence,
+                })
+        self.env['construction.boq.line'].create(line_vals_list)
+
+        if approve:
+            boqs.action_submit()
+            boqs.action_approve()
+        return boqs
+
+    @staticmethod
+    def product_lines(boqs):
+        return boqs.boq_line_ids.filtered(lambda l: not l.display_type)
+
+    def _pick_lines(self, boq, count):
+        lines = self.product_lines(boq)
+        return lines[:count] if count < len(lines) else lines
+
+    # -------------------------------------------------------------------------
+    # PURCHASING / STOCK / BILLS
+    # -------------------------------------------------------------------------
+    def create_purchase_orders(self, boqs, orders=1, order_lines=10, quantity=10.0, confirm=True):
+        vendor = self.get_vendor()
+        vals_list = []
+        for boq in boqs:
+            lines = self._pick_lines(boq, order_lines)
+            for _i in range(orders):
+                vals_list.append({
+                    'partner_id': vendor.id,
+                    'purchase_type': 'boq',
+                    'project_id': boq.project_id.id,
+                    'boq_id': boq.id,
+                    'order_line': [(0, 0, {
+                        'product_id': line.product_id.id,
+                        'name': line.name,
+                        'product_qty': quantity,
+                        'product_uom': line.uom_id.id,
+                        'price_unit': line.estimated_rate,
+                        'boq_line_id': line.id,
+                    }) for line in lines],
+                })
+        purchase_orders = self.env['purchase.order'].create(vals_list)
+        if confirm:
+            purchase_orders.button_confirm()
+        return purchase_orders
+
+    def create_pickings(self, boqs, pickings=1, picking_lines=10, quantity=1.0):
+        """Confirmed delivery transfers to the customer location, quantities set and ready to validate."""
+        warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.company.id)], limit=1)
+        picking_type = warehouse.out_type_id
+        location = warehouse.lot_stock_id
+        location_dest = self.env.ref('stock.stock_location_customers')
+
+        picking_vals_list = []
+        picking_lines_list = []
+        for boq in boqs:
+            lines = self._pick_lines(boq, picking_lines)
+            for _i in range(pickings):
+                picking_vals_list.append({
+                    'picking_type_id': picking_type.id,
+                    'location_id': location.id,
+                    'location_dest_id': location_dest.id,
+                    'project_id': boq.project_id.id,
+                    'company_id': self.company.id,
+                    'origin': boq.name,
+                })
+                picking_lines_list.append(lines)
+        records = self.env['stock.picking'].create(picking_vals_list)
+
+        move_vals_list = []
+        for picking, lines in zip(records, picking_lines_list):
+            for line in lines:
+                move_vals_list.append({
+                    'name': line.name,
+                    'product_id': line.product_id.id,
+                    'product_uom_qty': quantity,
+                    'product_uom': line.uom_id.id,
+                    'location_id': location.id,
+                    'location_dest_id': location_dest.id,
+                    'picking_id': picking.id,
+                    'picking_type_id': picking_type.id,
+                    'company_id': self.company.id,
+                    'boq_line_id': line.id,
+                })
+        moves = self.env['stock.move'].create(move_vals_list)
+        moves._action_confirm()
+        moves.write({'quantity': quantity, 'picked': True})
+        return records
+
+    def create_bills(self, boqs, bills=1, bill_lines=10, quantity=1.0):
+        """Draft vendor bills whose lines are linked to BOQ lines."""
+        vendor = self.get_vendor()
+        date = fields.Date.context_today(vendor)
+        vals_list = []
+        for boq in boqs:
+            lines = self._pick_lines(boq, bill_lines)
+            for _i in range(bills):
+                vals_list.append({
+                    'move_type': 'in_invoice',
+                    'partner_id': vendor.id,
+                    'invoice_date': date,
+                    'company_id': self.company.id,
+                    'invoice_line_ids': [(0, 0, {
+                        'product_id': line.product_id.id,
+                        'name': line.name,
+                        'quantity': quantity,
+                        'price_unit': line.estimated_rate,
+                        'account_id': line.expense_account_id.id,
+                        'analytic_distribution': {str(boq.analytic_account_id.id): 100.0},
+                        'boq_line_id': line.id,
+                        'tax_ids': [(5, 0, 0)],
+                    }) for line in lines],
+                })
+        return self.env['account.move'].create(vals_list)
+
+    def prepare_ledger_vals(self, lines, count, quantity=0.1):
+        """Consumption ledger values spread round-robin over ``lines``."""
+        date = fields.Date.context_today(lines)
+        user_id = self.env.user.id
+        vals_list = []
+        for index in range(count):
+            line = lines[index % len(lines)]
+            vals_list.append({
+                'boq_line_id': line.id,
+                'source_model': 'sitemate.benchmark',
+                'source_id': index + 1,
+                'quantity': quantity,
+                'amount': round(quantity * line.estimated_rate, 2),
+                'date': date,
+                'user_id': user_id,
+            })
+        return vals_list
+
+    def create_ledger_entries(self, lines, count, quantity=0.1):
+        return self.env['construction.boq.consumption'].create(self.prepare_ledger_vals(lines, count, quantity))
+
+    # -------------------------------------------------------------------------
+    # FULL DATA SET
+    # -------------------------------------------------------------------------
+    def generate(self, projects=1, lines=100, section_every=10,
+                 orders=1, order_lines=10, pickings=1, picking_lines=10,
+                 bills=1, bill_lines=10, ledger_entries=0):
+        """
+        Create a complete data set and return its records in a dict:
+        projects, products, boqs, boq_lines, purchase_orders, pickings, bills, consumptions.
+        Pickings are left ready to validate and bills in draft, so both can be
+        timed by the caller.
+        """
+        products = self.create_products(max(lines, 1))
+        project_records = self.create_projects(projects)
+        boqs = self.create_boqs(project_records, products, lines=lines, section_every=section_every)
+        boq_lines = self.product_lines(boqs)
+        Consumption = self.env['construction.boq.consumption']
+        return {
+            'projects': project_records,
+            'products': products,
+            'boqs': boqs,
+            'boq_lines': boq_lines,
+            'purchase_orders': self.create_purchase_orders(boqs, orders, order_lines) if orders else self.env['purchase.order'],
+            'pickings': self.create_pickings(boqs, pickings, picking_lines) if pickings else self.env['stock.picking'],
+            'bills': self.create_bills(boqs, bills, bill_lines) if bills else self.env['account.move'],
+            'consumptions': self.create_ledger_entries(boq_lines, ledger_entries) if ledger_entries else Consumption,
+        }
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _, Command
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from collections import defaultdict
+
+
+class ConstructionBOQMaterialIssue(models.TransientModel):
+    _name = 'construction.boq.material.issue'
+    _description = 'Bulk Material Issue from BOQ'
+
+    boq_id = fields.Many2one('construction.boq', string='BOQ Reference', required=True, readonly=True)
+    project_id = fields.Many2one('project.project', related='boq_id.project_id', string='Project')
+    company_id = fields.Many2one('res.company', related='boq_id.company_id', string='Company')
+
+    boq_line_ids = fields.Many2many(
+        'construction.boq.line',
+        string='Lines / Sections',
+        domain="[('boq_id', '=', boq_id), ('display_type', 'in', (False, 'line_section'))]",
+        help="Select product lines and/or sections. Selecting a section issues every product line under it. "
+             "Leave empty to issue the whole BOQ."
+    )
+
+    picking_type_id = fields.Many2one(
+        'stock.picking.type',
+        string='Operation Type',
+        required=True,
+        domain="[('code', 'in', ('outgoing', 'internal')), ('company_id', '=', company_id)]"
+    )
+    location_id = fields.Many2one(
+        'stock.location',
+        string='Source Location',
+        compute='_compute_location_id',
+        store=True,
+        readonly=False,
+        required=True
+    )
+    location_dest_id = fields.Many2one('stock.location', string='Destination Location', required=True)
+
+    split_by_section = fields.Boolean(
+        string='One Transfer per Section',
+        default=True,
+        help="Create a separate transfer for each BOQ section instead of a single transfer."
+    )
+
+    issue_line_ids = fields.One2many(
+        'construction.boq.material.issue.line',
+        'wizard_id',
+        string='Quantities to Issue',
+        compute='_compute_issue_line_ids',
+        store=True,
+        readonly=False,
+    )
+
+    @api.depends('picking_type_id')
+    def _compute_location_id(self):
+        for wizard in self:
+            wizard.location_id = wizard.picking_type_id.default_location_src_id
+
+    @api.depends('boq_id', 'boq_line_ids')
+    def _compute_issue_line_ids(self):
+        for wizard in self:
+            lines_by_section = wizard._get_lines_by_section()
+            all_lines = self.env['construction.boq.line'].union(*lines_by_section.values())
+            issuable = wizard._get_issuable_quantities(all_lines)
+            commands = [Command.clear()]
+            for section, lines in lines_by_section.items():
+                for line in lines:
+                    qty = issuable.get(line.id, 0.0)
+                    if qty > 0.0001:
+                        commands.append(Command.create({
+                            'boq_line_id': line.id,
+                            'section_line_id': section.id,
+                            'issuable_quantity': qty,
+                            'quantity': qty,
+                        }))
+            wizard.issue_line_ids = commands
+
+    # -------------------------------------------------------------------------
+    # HELPERS
+    # -------------------------------------------------------------------------
+    def _get_lines_by_section(self):
+        """
+        Expand the selection into product lines grouped by their section line.
+        Returns a dict {section_line (or empty recordset): product lines}.
+        """
+        self.ensure_one()
+        all_lines = self.boq_id._origin.boq_line_ids.sorted(lambda l: (l.sequence, l.id))
+        selected = self.boq_line_ids._origin
+        selected_sections = selected.filtered(lambda l: l.display_type == 'line_section')
+
+        lines_by_section = defaultdict(lambda: self.env['construction.boq.line'])
+        current_section = self.env['construction.boq.line']
+        for line in all_lines:
+            if line.display_type == 'line_section':
+                current_section = line
+                continue
+            if line.display_type:
+                continue
+            if not selected or line in selected or current_section in selected_sections:
+                lines_by_section[current_section] |= line
+        return lines_by_section
+
+    def _get_issuable_quantities(self, lines):
+        """
+        Quantity still available for issue per BOQ line, in one aggregated query:
+        remaining_quantity minus quantities already pending on open issue moves,
+        converted into the BOQ line UoM (see _get_ordered_quantities).
+        """
+        line_ids = [line_id for line_id in lines.ids if line_id]
+        if not line_ids:
+            return {}
+        Line = self.env['construction.boq.line']
+        self.env['stock.move'].flush_model(['state', 'location_dest_id'])
+        pending_query = Line._converted_quantity_query('stock.move', 'product_uom_qty', 'product_uom', SQL("""
+            src.boq_line_id = ANY(%s)
+            AND src.state NOT IN ('done', 'cancel')
+            AND src.location_dest_id IN (
+                    SELECT id FROM stock_location WHERE usage IN ('customer', 'production')
+                )
+        """, line_ids))
+        Line.flush_model(['remaining_quantity'])
+        self.env.cr.execute(SQL("""
+            WITH pending AS (%s)
+            SELECT l.id, l.remaining_quantity - COALESCE(p.qty, 0.0)
+              FROM construction_boq_line l
+         LEFT JOIN pending p ON p.line_id = l.id
+             WHERE l.id = ANY(%s)
+        """, pending_query, line_ids))
+        return dict(self.env.cr.fetchall())
+
+    # -------------------------------------------------------------------------
+    # ACTION
+    # -------------------------------------------------------------------------
+    def action_issue(self):
+        self.ensure_one()
+        if self.boq_id.state not in ('approved', 'locked'):
+            raise UserError(_('Material can only be issued from an Approved or Locked BOQ.'))
+
+        issue_lines = self.issue_line_ids.filtered(lambda l: l.quantity > 0.0001)
+        if not issue_lines:
+            raise UserError(_('Nothing to issue: the selected lines have no remaining quantity.'))
+
+        # Validate against the current issuable quantities, not the ones shown when the wizard opened
+        issuable = self._get_issuable_quantities(issue_lines.boq_line_id)
+        exceeded = issue_lines.filtered(lambda l: l.quantity > issuable.get(l.boq_line_id.id, 0.0) + 0.0001)
+        if exceeded:
+            raise UserError(_('Quantity to issue exceeds the issuable quantity:\n%s') % '\n'.join(
+                _('%(name)s: %(qty)s > %(issuable)s %(uom)s') % {
+                    'name': line.boq_line_id.name,
+                    'qty': line.quantity,
+                    'issuable': issuable.get(line.boq_line_id.id, 0.0),
+                    'uom': line.uom_id.name or '',
+                } for line in exceeded
+            ))
+
+        # Group the issue lines per transfer
+        groups = defaultdict(lambda: self.env['construction.boq.material.issue.line'])
+        for issue_line in issue_lines:
+            key = issue_line.section_line_id if self.split_by_section else False
+            groups[key] |= issue_line
+
+        # 1. Create all transfers in one batch
+        group_keys = list(groups)
+        picking_vals_list = [{
+            'picking_type_id': self.picking_type_id.id,
+            'location_id': self.location_id.id,
+            'location_dest_id': self.location_dest_id.id,
+            'project_id': self.boq_id.project_id.id,
+            'company_id': self.boq_id.company_id.id,
+            'origin': f"{self.boq_id.name} - {key.name}" if key else self.boq_id.name,
+        } for key in group_keys]
+        pickings = self.env['stock.picking'].create(picking_vals_list)
+
+        # 2. Create all moves in one batch, already linked to their BOQ line
+        move_vals_list = []
+        for key, picking in zip(group_keys, pickings):
+            for issue_line in groups[key]:
+                line = issue_line.boq_line_id
+                move_vals_list.append({
+                    'name': line.name,
+                    'product_id': line.product_id.id,
+                    'product_uom_qty': issue_line.quantity,
+                    'product_uom': (line.uom_id or line.product_id.uom_id).id,
+                    'location_id': self.location_id.id,
+                    'location_dest_id': self.location_dest_id.id,
+                    'picking_id': picking.id,
+                    'picking_type_id': self.picking_type_id.id,
+                    'company_id': self.boq_id.company_id.id,
+                    'boq_line_id': line.id,
+                })
+        self.env['stock.move'].create(move_vals_list)
+
+        action = self.env['ir.actions.act_window']._for_xml_id('stock.action_picking_tree_all')
+        if len(pickings) == 1:
+            action['views'] = [(self.env.ref('stock.view_picking_form').id, 'form')]
+            action['res_id'] = pickings.id
+        else:
+            action['domain'] = [('id', 'in', pickings.ids)]
+        action['context'] = {}
+        return action
+
+
+class ConstructionBOQMaterialIssueLine(models.TransientModel):
+    _name = 'construction.boq.material.issue.line'
+    _description = 'Bulk Material Issue Line'
+
+    wizard_id = fields.Many2one('construction.boq.material.issue', required=True, ondelete='cascade')
+    boq_line_id = fields.Many2one('construction.boq.line', string='BOQ Item', required=True, readonly=True)
+    section_line_id = fields.Many2one('construction.boq.line', string='Section', readonly=True)
+    product_id = fields.Many2one(related='boq_line_id.product_id')
+    uom_id = fields.Many2one(related='boq_line_id.uom_id')
+    issuable_quantity = fields.Float(string='Issuable Qty', readonly=True)
+    quantity = fields.Float(string='Qty to Issue')
+